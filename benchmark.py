@@ -0,0 +1,389 @@
+"""
+Benchmarks for the pipeline's hot paths.
+
+    python benchmark.py push             # git backend against a local bare repo served by `git http-backend`
+    python benchmark.py push --github    # git vs graphql vs rest backends against real GitHub repos
+                                         # (needs GITHUB_TOKEN / GITHUB_USERNAME, creates + deletes a temp repo)
+    python benchmark.py extract          # linear JSON extractor vs the old regex cascade on large responses
+    python benchmark.py formats          # json vs file-block output format: output tokens, parse time, truncation
+    python benchmark.py formats --live 3 # + 3 real round 1 generations per format (needs API_TOKEN)
+"""
+import os
+import sys
+import re
+import json
+import time
+import uuid
+import timeit
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import helper
+
+
+FILE_COUNTS = [3, 30, 300]
+
+
+def make_files(count: int) -> list[dict]:
+    """index.html + README.md + .gitignore, padded with small site assets"""
+    files = [
+        {"name": "index.html", "content": "<!DOCTYPE html>\n<html><body><h1>bench</h1></body></html>\n" * 50},
+        {"name": "README.md", "content": f"# Bench\n\nrun {uuid.uuid4().hex}\n"},
+        {"name": ".gitignore", "content": helper.get_default_gitignore()},
+    ]
+    for i in range(count - len(files)):
+        files.append({"name": f"assets/part-{i}.js", "content": f"console.log({i}, '{uuid.uuid4().hex}');\n" * 20})
+    return files[:count]
+
+
+# -------------------------- LOCAL GIT SERVER ---------------------------
+class GitHttpBackendHandler(BaseHTTPRequestHandler):
+    """Minimal CGI bridge to `git http-backend` for the repos under server.project_root"""
+
+    def do_GET(self):
+        self.run_backend()
+
+    def do_POST(self):
+        self.run_backend()
+
+    def read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def run_backend(self):
+        path, _, query = self.path.partition("?")
+        body = self.read_body()
+        env = {
+            **os.environ,
+            "GIT_PROJECT_ROOT": self.server.project_root,
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "REQUEST_METHOD": self.command,
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "CONTENT_TYPE": self.headers.get("Content-Type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "REMOTE_ADDR": self.client_address[0],
+        }
+        if self.headers.get("Content-Encoding"):
+            env["HTTP_CONTENT_ENCODING"] = self.headers["Content-Encoding"]
+        if self.headers.get("Git-Protocol"):
+            env["GIT_PROTOCOL"] = self.headers["Git-Protocol"]
+
+        result = subprocess.run(["git", "http-backend"], input=body, env=env, capture_output=True)
+        raw_headers, _, payload = result.stdout.partition(b"\r\n\r\n")
+
+        status = 200
+        headers = []
+        for line in raw_headers.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.lower() == "status":
+                status = int(value.split()[0])
+            elif name:
+                headers.append((name, value.strip()))
+
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_git_server(project_root: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GitHttpBackendHandler)
+    server.project_root = project_root
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def init_bare_repo(project_root: str, repo_name: str):
+    """Bare repo with one LICENSE commit on main, like a GitHub auto_init repo"""
+    bare = os.path.join(project_root, f"{repo_name}.git")
+    seed = tempfile.mkdtemp(prefix="seed-")
+    try:
+        subprocess.run(["git", "init", "-q", "--bare", "-b", "main", bare], check=True)
+        subprocess.run(["git", f"--git-dir={bare}", "config", "http.receivepack", "true"], check=True)
+        subprocess.run(["git", f"--git-dir={bare}", "config", "uploadpack.allowFilter", "true"], check=True)
+        subprocess.run(["git", "init", "-q", "-b", "main", seed], check=True)
+        with open(os.path.join(seed, "LICENSE"), "w") as f:
+            f.write("MIT License\n")
+        git = ["git", "-C", seed, "-c", "user.name=bench", "-c", "user.email=bench@example.com"]
+        subprocess.run(git + ["add", "LICENSE"], check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "Initial commit"], check=True)
+        subprocess.run(git + ["push", "-q", bare, "main"], check=True)
+    finally:
+        shutil.rmtree(seed)
+    return bare
+# -------------------------- LOCAL GIT SERVER --------------------------- #
+
+
+async def time_push(backend: str, repo_name: str, files: list[dict]) -> float:
+    push = {
+        "git": helper.push_files_git_async,
+        "graphql": helper.push_files_graphql_async,
+        "rest": helper.push_files_rest_async,
+    }[backend]
+    start = time.perf_counter()
+    await push(repo_name, files, 1)
+    return time.perf_counter() - start
+
+
+async def bench_push_local():
+    project_root = tempfile.mkdtemp(prefix="git-http-")
+    server = start_local_git_server(project_root)
+    helper.git_push_remote = f"http://127.0.0.1:{server.server_port}/{{repo}}.git"
+    try:
+        for count in FILE_COUNTS:
+            repo_name = f"bench-{count}"
+            bare = init_bare_repo(project_root, repo_name)
+            files = make_files(count)
+            elapsed = await time_push("git", repo_name, files)
+
+            # the pushed tree must hold every new file plus the untouched LICENSE
+            listed = subprocess.run(
+                ["git", f"--git-dir={bare}", "ls-tree", "-r", "--name-only", "main"],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            assert set(listed) == {"LICENSE", *(f["name"] for f in files)}, "pushed tree mismatch"
+            print(f"git   {count:>4} files: {elapsed * 1000:8.1f} ms  (local http-backend, tree verified)")
+    finally:
+        server.shutdown()
+        shutil.rmtree(project_root)
+
+
+async def bench_push_github():
+    repo_name = f"push-bench-{uuid.uuid4().hex[:8]}"
+    await helper.create_github_repo_async(repo_name, False)
+    try:
+        for count in FILE_COUNTS:
+            for backend in ["rest", "graphql", "git"]:
+                elapsed = await time_push(backend, repo_name, make_files(count))
+                print(f"{backend:<7} {count:>4} files: {elapsed * 1000:8.1f} ms")
+    finally:
+        await helper.delete_github_repo_async(repo_name)
+
+
+# -------------------------- JSON EXTRACTION ---------------------------
+def regex_extract_json_from_response(response_text: str) -> dict:
+    """The previous regex cascade, kept as the baseline"""
+    matches = re.findall(r'```json\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+    if matches:
+        try:
+            return json.loads(matches[-1])
+        except json.JSONDecodeError:
+            pass
+    matches = re.findall(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+    for match in reversed(matches):
+        try:
+            return json.loads(match)
+        except json.JSONDecodeError:
+            continue
+    matches = re.findall(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response_text, re.DOTALL)
+    for match in reversed(matches):
+        try:
+            parsed = json.loads(match)
+            if isinstance(parsed, dict) and 'files' in parsed:
+                return parsed
+        except json.JSONDecodeError:
+            continue
+    try:
+        return json.loads(response_text.strip())
+    except json.JSONDecodeError:
+        pass
+    raise ValueError("Could not extract valid JSON from LLM response")
+
+
+def make_code_structure(size: int, quoted: bool = False) -> dict:
+    """files object with ~size chars of html/js, quoted: with string literals in the js"""
+    script = "function f%d() { if (a) { return {x: 1, y: [1, 2]}; } }\n"
+    if quoted:
+        script = 'function f%d() { const el = find("#item"); if (el) { el.textContent = "item"; } }\n'
+    body = "".join(script % i for i in range(size // len(script)))
+    return {
+        "files": {
+            "index.html": f"<!DOCTYPE html>\n<html><body><script>\n{body}</script></body></html>",
+            "README.md": "# App\n\nUsage: open `index.html` {or the pages url}.\n",
+            ".gitignore": "node_modules/\n.env\n",
+        },
+        "description": "Generated app",
+    }
+
+
+def make_response(size: int, fenced: bool = True, truncated: bool = False, quoted: bool = False) -> str:
+    """Model-like output: prose + ```json fence around a files object with ~size chars of html/js"""
+    response = json.dumps(make_code_structure(size, quoted), indent=2)
+    if truncated:
+        response = response[: int(len(response) * 0.9)]
+    if fenced:
+        response = f"Here is the app:\n```json\n{response}\n```\nLet me know {{if}} you need changes."
+    return response
+
+
+def bench_extract():
+    cases = [
+        ("50 KB fenced", make_response(50_000)),
+        ("100 KB fenced", make_response(100_000)),
+        ("100 KB raw", make_response(100_000, fenced=False)),
+        ("100 KB truncated", make_response(100_000, truncated=True)),
+        ("150 KB trunc. js", make_response(150_000, truncated=True, quoted=True)),
+    ]
+    for name, response in cases:
+        timings = {}
+        for label, extract in [("regex", regex_extract_json_from_response), ("linear", helper.extract_json_from_response)]:
+            def run():
+                try:
+                    return extract(response)
+                except ValueError:
+                    return None
+            found = run()
+            runs = 5
+            timings[label] = min(timeit.repeat(run, number=runs, repeat=3)) / runs
+            ok = "files" in found if isinstance(found, dict) else "no json"
+            print(f"{name:<18} {label:<7} {timings[label] * 1000:9.2f} ms   files found: {ok}")
+        print(f"{'':<18} speedup {timings['regex'] / timings['linear']:8.1f}x")
+# -------------------------- JSON EXTRACTION --------------------------- #
+
+
+# -------------------------- OUTPUT FORMATS ---------------------------
+def count_tokens(text: str) -> int:
+    """tiktoken (o200k) if installed, else a words / punctuation count that tracks BPE closely enough to compare"""
+    try:
+        import tiktoken
+    except ImportError:
+        return len(re.findall(r"\w+|[^\w\s]|\n", text))
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def encode_response(code_structure: dict, output_format: str) -> str:
+    """What the model has to write to return code_structure in output_format"""
+    if output_format == "blocks":
+        blocks = "".join(f"=== FILE: {name} ===\n{content}\n" for name, content in code_structure["files"].items())
+        return blocks + "=== END ===\n"
+    return json.dumps(code_structure, indent=2)
+
+
+def sample_site() -> dict:
+    """Realistic small app: quoted attributes, multi-line css / js, a markdown README"""
+    html = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Sales Summary</title>
+<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+<style>
+  body { padding: 2rem; font-family: "Segoe UI", sans-serif; }
+  .card { border-radius: 8px; box-shadow: 0 2px 6px rgba(0, 0, 0, 0.1); }
+</style>
+</head>
+<body>
+<h1 class="mb-4">Sales Summary</h1>
+<div id="app" class="card p-3"><p id="total-sales">Loading...</p></div>
+<script>
+  const params = new URLSearchParams(window.location.search);
+  const url = params.get("url") || "data.csv";
+  fetch(url)
+    .then((response) => response.text())
+    .then((text) => {
+      const rows = text.trim().split("\\n").slice(1).map((line) => line.split(","));
+      const total = rows.reduce((sum, row) => sum + parseFloat(row[1] || "0"), 0);
+      document.querySelector("#total-sales").textContent = `Total: ${total.toFixed(2)}`;
+    })
+    .catch((error) => {
+      document.querySelector("#app").innerHTML = `<div class="alert alert-danger">${error.message}</div>`;
+    });
+</script>
+</body>
+</html>
+"""
+    readme = "# Sales Summary\n\n## Summary\nSums the \"sales\" column of a CSV.\n\n## Usage\nOpen `index.html?url=...`.\n\n## License\nMIT\n"
+    return {"files": {"index.html": html * 8, "README.md": readme, ".gitignore": "node_modules/\n.env\n"}, "description": "Sales summary"}
+
+
+def bench_formats():
+    cases = [
+        ("sample site", sample_site()),
+        ("50 KB js", make_code_structure(50_000)),
+    ]
+    for name, code_structure in cases:
+        tokens = {}
+        for output_format in ["json", "blocks"]:
+            response = encode_response(code_structure, output_format)
+            tokens[output_format] = count_tokens(response)
+
+            runs = 5
+            parse = min(timeit.repeat(
+                lambda: helper.extract_code_structure(response, output_format), number=runs, repeat=3
+            )) / runs
+            assert helper.extract_code_structure(response, output_format)["files"] == code_structure["files"]
+
+            # cut off at 90%: how much of the answer is still usable
+            try:
+                salvaged = len(helper.extract_code_structure(response[: int(len(response) * 0.9)], output_format)["files"])
+            except ValueError:
+                salvaged = 0
+            print(f"{name:<12} {output_format:<7} {len(response):>8} chars {tokens[output_format]:>7} tokens"
+                  f"  parse {parse * 1000:6.2f} ms  files kept at 90%: {salvaged}/{len(code_structure['files'])}")
+        print(f"{'':<12} blocks saves {1 - tokens['blocks'] / tokens['json']:.1%} output tokens")
+
+
+async def bench_formats_live(runs: int):
+    """Same round 1 task through the real LLM in both formats (cache bypassed)"""
+    task = {
+        "task": "format-bench",
+        "brief": "Single page that fetches a CSV from ?url=, sums its sales column and shows it in #total-sales, styled with Bootstrap.",
+        "checks": ["#total-sales shows the sum", "Bootstrap is loaded from a CDN"],
+        "attachments": [],
+        "no_cache": True,
+    }
+    for output_format in ["json", "blocks"]:
+        for _ in range(runs):
+            start = time.perf_counter()
+            code_structure = await helper.write_code_with_llm_async({**task, "output_format": output_format})
+            elapsed = time.perf_counter() - start
+            written = count_tokens(encode_response(code_structure, output_format))
+            print(f"{output_format:<7} {elapsed * 1000:9.0f} ms  ~{written} output tokens  ({written / elapsed:.0f} tok/s)")
+# -------------------------- OUTPUT FORMATS --------------------------- #
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    push_parser = commands.add_parser("push", help="push backends at 3 / 30 / 300 files")
+    push_parser.add_argument("--github", action="store_true", help="compare backends against real GitHub")
+
+    commands.add_parser("extract", help="JSON extraction on 50-100 KB synthetic responses")
+
+    formats_parser = commands.add_parser("formats", help="json vs file-block output: tokens, parse time, truncation")
+    formats_parser.add_argument("--live", type=int, metavar="RUNS", default=0, help="also time RUNS real LLM calls per format")
+
+    args = parser.parse_args()
+    if args.command == "push":
+        asyncio.run(bench_push_github() if args.github else bench_push_local())
+    elif args.command == "extract":
+        bench_extract()
+    elif args.command == "formats":
+        bench_formats()
+        if args.live:
+            asyncio.run(bench_formats_live(args.live))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,23 @@
 import os
-import time 
+import time
+import uuid
+import asyncio
+import threading
+import bisect
+import tempfile
+from datetime import datetime
+import weakref
 from dotenv import load_dotenv
-import requests
+import httpx
+from urllib.parse import urlsplit
+import re
 import base64
+import hashlib
 import json
 import textwrap
+import difflib
+import csv
+from jobs import checkpoints, job_key
 
 load_dotenv()
 
@@ -14,6 +27,219 @@ api_token = os.getenv('API_TOKEN')
 gh_token = os.getenv('GITHUB_TOKEN')
 gh_user = os.getenv('GITHUB_USERNAME')
 
+# connection pool tuning (per host)
+http_pool_maxsize = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+github_pool_maxsize = int(os.getenv('GITHUB_POOL_MAXSIZE', '20'))
+llm_pool_maxsize = int(os.getenv('LLM_POOL_MAXSIZE', '10'))
+
+# push tuning: max parallel blob uploads, text files up to this size skip the blob API (0 disables)
+push_blob_concurrency = int(os.getenv('PUSH_BLOB_CONCURRENCY', '8'))
+push_inline_max_bytes = int(os.getenv('PUSH_INLINE_MAX_BYTES', str(256 * 1024)))
+# push backend: "rest" (git data api), "graphql" (createCommitOnBranch) or "git" (cli + smart http),
+# non-rest backends fall back to rest on error
+push_backend = os.getenv('PUSH_BACKEND', 'rest').lower()
+git_push_remote = os.getenv('GIT_PUSH_REMOTE', 'https://github.com/{user}/{repo}.git')
+
+# round 2 repo fetch: parallel blob reads, files above this size / binaries are never pulled into the prompt
+repo_fetch_concurrency = int(os.getenv('REPO_FETCH_CONCURRENCY', '8'))
+repo_fetch_max_bytes = int(os.getenv('REPO_FETCH_MAX_BYTES', str(200 * 1024)))
+binary_extensions = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".bmp", ".svgz",
+    ".pdf", ".zip", ".gz", ".tar", ".tgz", ".7z", ".rar",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".mp3", ".mp4", ".wav", ".ogg", ".webm", ".mov",
+    ".exe", ".dll", ".so", ".bin", ".wasm", ".pyc",
+}
+
+# warm pool of pre-provisioned repos (0 disables)
+repo_pool_size = int(os.getenv('REPO_POOL_SIZE', '0'))
+repo_pool_refill_interval = float(os.getenv('REPO_POOL_REFILL_INTERVAL', '30'))
+repo_pool_refill_batch = int(os.getenv('REPO_POOL_REFILL_BATCH', '2'))
+repo_pool_max_age = float(os.getenv('REPO_POOL_MAX_AGE', str(7 * 24 * 3600)))
+repo_pool_prefix = os.getenv('REPO_POOL_PREFIX', 'pool-')
+
+# force_recreate on an existing repo: "reset" (force branch to a fresh LICENSE-only commit) or "delete"
+repo_recreate_mode = os.getenv('REPO_RECREATE_MODE', 'reset').lower()
+
+# local record of what each repo holds (pushed files by git blob sha, head sha, pages url), round 2
+# reads it instead of the remote while the remote head still matches (ARTIFACTS=0 disables)
+artifacts_enabled = os.getenv('ARTIFACTS', '1') == '1'
+artifacts_dir = os.getenv('ARTIFACTS_DIR', '.artifacts')
+
+# stream llm responses (SSE) and extract files while they arrive, also per task with "stream": true
+llm_stream = os.getenv('LLM_STREAM', '0') == '1'
+
+# llm output wire format: "json" ({"files": {...}}) or "blocks" (=== FILE: name === sections),
+# also per task with "output_format"
+llm_output_format = os.getenv('LLM_OUTPUT_FORMAT', 'json').lower()
+
+# round 1 as parallel per-file calls (index.html + README.md), also per task with "split_files": true
+llm_split_files = os.getenv('LLM_SPLIT_FILES', '0') == '1'
+
+# round 2 update mode: "full" (complete files) or "edits" (search/replace hunks applied locally,
+# any failure retries in full mode), also per task with "update_mode"
+llm_update_mode = os.getenv('LLM_UPDATE_MODE', 'full').lower()
+# a SEARCH that doesn't match exactly (even ignoring whitespace) may still match a window this similar
+edit_fuzzy_threshold = float(os.getenv('EDIT_FUZZY_THRESHOLD', '0.9'))
+
+# input token budget for the current files in a round 2 prompt (index.html and README.md always go in full)
+round2_context_tokens = int(os.getenv('ROUND2_CONTEXT_TOKENS', '60000'))
+# files that only cost tokens in a prompt, they are listed but never included
+low_value_files = {
+    "license", "license.md", "license.txt", "copying", ".gitignore", ".gitattributes", ".ds_store",
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "pipfile.lock", "cargo.lock", "composer.lock",
+}
+low_value_suffixes = (".min.js", ".min.css", ".map", ".lock")
+
+# text attachments (txt / csv / json ...) share this many prompt tokens per request, split into parts
+# of up to ATTACHMENT_CHUNK_TOKENS at row / record boundaries. Over budget an attachment is cut to
+# head + tail records (if at least ATTACHMENT_MIN_RECORDS fit), else to a schema + sample summary.
+attachment_token_budget = int(os.getenv('ATTACHMENT_TOKENS', '20000'))
+attachment_chunk_tokens = int(os.getenv('ATTACHMENT_CHUNK_TOKENS', '2000'))
+attachment_min_records = int(os.getenv('ATTACHMENT_MIN_RECORDS', '20'))
+
+# on-disk llm response cache (LLM_CACHE=0 bypasses it, as does "no_cache": true on a task)
+llm_cache_enabled = os.getenv('LLM_CACHE', '1') == '1'
+llm_cache_dir = os.getenv('LLM_CACHE_DIR', '.llm_cache')
+llm_cache_max_bytes = int(os.getenv('LLM_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+llm_url = "https://aipipe.org/openrouter/v1/chat/completions"
+# answers cut off by max_tokens (finish_reason "length") are continued up to this many times
+llm_max_continuations = int(os.getenv('LLM_MAX_CONTINUATIONS', '2'))
+# a continuation that repeats the tail of the partial answer is trimmed (overlaps shorter than the min are kept)
+continuation_overlap_window = 500
+continuation_min_overlap = 16
+
+# hedged llm requests: when the model has no answer (first token, if streamed) within this percentile
+# of its observed latency, the same request also goes to LLM_HEDGE_MODEL at LLM_HEDGE_URL, first
+# answer wins and the other request is cancelled. Empty LLM_HEDGE_MODEL disables hedging.
+llm_timeout = float(os.getenv('LLM_TIMEOUT', '500'))
+llm_hedge_model = os.getenv('LLM_HEDGE_MODEL', '')
+llm_hedge_url = os.getenv('LLM_HEDGE_URL', llm_url)
+llm_hedge_api_key = os.getenv('LLM_HEDGE_API_KEY', api_token)
+llm_hedge_percentile = float(os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+# until a model has this many samples the hedge fires after the default delay
+llm_hedge_min_samples = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '10'))
+llm_hedge_default_delay = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '60'))
+
+
+# -------------------- HTTP CLIENT ---------------------------
+class HttpClient:
+    """
+    Shared keep-alive HTTP client used by every GitHub / LLM / evaluation call.
+    Holds one httpx.AsyncClient per event loop, with its own connection pool per
+    host and default headers per host, so a task reuses warm TCP+TLS connections.
+    """
+
+    def __init__(self, pool_maxsize: int = 10, timeout: float = 60):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.host_headers = {}
+        self.host_limits = {}
+        # an AsyncClient is bound to the loop it was created on
+        self._clients = weakref.WeakKeyDictionary()
+
+    def configure_host(self, host: str, headers: dict = None, pool_maxsize: int = None):
+        """Set default headers and a dedicated, bounded connection pool for one host"""
+        if headers:
+            self.host_headers[host] = headers
+        if pool_maxsize:
+            self.host_limits[host] = pool_maxsize
+
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            mounts = {
+                f"https://{host}": httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(max_connections=maxsize, max_keepalive_connections=maxsize)
+                )
+                for host, maxsize in self.host_limits.items()
+            }
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize),
+                mounts=mounts,
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def request(self, method: str, url: str, headers: dict = None, **kwargs) -> httpx.Response:
+        merged_headers = dict(self.host_headers.get(urlsplit(url).hostname, {}))
+        if headers:
+            merged_headers.update(headers)
+        return await self.client().request(method, url, headers=merged_headers, **kwargs)
+
+    def stream(self, method: str, url: str, headers: dict = None, **kwargs):
+        """Streaming request, use as `async with http.stream(...) as response`"""
+        merged_headers = dict(self.host_headers.get(urlsplit(url).hostname, {}))
+        if headers:
+            merged_headers.update(headers)
+        return self.client().stream(method, url, headers=merged_headers, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self):
+        """Close the client of the running loop (call on shutdown)"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+http = HttpClient(pool_maxsize=http_pool_maxsize)
+http.configure_host(
+    "api.github.com",
+    headers={
+        "Authorization": f"Bearer {gh_token}",
+        "Accept": "application/vnd.github+json"
+    },
+    pool_maxsize=github_pool_maxsize,
+)
+http.configure_host(
+    "aipipe.org",
+    headers={
+        "Authorization": f"Bearer {api_token}",
+        "Content-Type": "application/json"
+    },
+    pool_maxsize=llm_pool_maxsize,
+)
+if llm_hedge_model and urlsplit(llm_hedge_url).hostname != "aipipe.org":
+    http.configure_host(
+        urlsplit(llm_hedge_url).hostname,
+        headers={
+            "Authorization": f"Bearer {llm_hedge_api_key}",
+            "Content-Type": "application/json"
+        },
+        pool_maxsize=llm_pool_maxsize,
+    )
+
+
+# sync callers share one background loop, so their client pool stays warm too
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+def run_sync(coro):
+    """Run a coroutine to completion from sync code"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="helper-sync-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
+
+# -------------------- HTTP CLIENT --------------------------- #
+
 
 
 def verify_secret(test):
@@ -22,16 +248,14 @@ def verify_secret(test):
 
 
 # -------------------- GIT REPO STUFF ---------------------------
-def check_repo_exists(repo_name: str) -> bool:
+# last (branch, head oid) seen per repo, so a GraphQL push can skip its head query
+known_heads = {}
+
+async def check_repo_exists_async(repo_name: str) -> bool:
     """Check if a GitHub repository exists"""
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }
     
-    response = requests.get(
-        f"https://api.github.com/repos/{gh_user}/{repo_name}",
-        headers=headers
+    response = await http.get(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}"
     )
     
     return response.status_code == 200
@@ -39,16 +263,29 @@ def check_repo_exists(repo_name: str) -> bool:
 
 
 
-def create_github_repo(repo_name: str, force_recreate: bool):
+async def create_github_repo_async(repo_name: str, force_recreate: bool, description: str = None):
     # create repo w/ given repo name
 
-    # Check if repo exists and delete if force_recreate is True
-    if force_recreate and check_repo_exists(repo_name):
+    # Check if repo exists and reset / delete it if force_recreate is True
+    repo_response = None
+    if force_recreate:
+        repo_response = await http.get(
+            f"https://api.github.com/repos/{gh_user}/{repo_name}"
+        )
+
+    if repo_response is not None and repo_response.status_code == 200:
+        if repo_recreate_mode == "reset":
+            try:
+                await reset_github_repo_async(repo_name, repo_response.json()["default_branch"])
+                return repo_response.json()
+            except Exception as e:
+                print(f"⚠️ Reset in place failed, recreating instead: {e}")
+
         print(f"🔄 Repo '{repo_name}' already exists. Deleting...")
-        delete_github_repo(repo_name)
+        await delete_github_repo_async(repo_name)
         
         # Wait a moment for GitHub to process the deletion
-        time.sleep(2)
+        await asyncio.sleep(2)
         print("⏳ Waiting for deletion to complete...")
 
 
@@ -58,15 +295,12 @@ def create_github_repo(repo_name: str, force_recreate: bool):
         "auto_init": True,
         "license_template": "mit",        
     }
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }
+    if description:
+        payload["description"] = description
 
     # make sure git_token admin permission w/ R & W is added
-    response = requests.post(
+    response = await http.post(
         "https://api.github.com/user/repos",
-        headers=headers,
         json=payload
     )
 
@@ -76,13 +310,12 @@ def create_github_repo(repo_name: str, force_recreate: bool):
     elif response.status_code == 422:
         # Repo still exists (deletion might not have completed)
         print(f"⚠️ Repo still exists. Retrying deletion...")
-        delete_github_repo(repo_name)
-        time.sleep(3)
+        await delete_github_repo_async(repo_name)
+        await asyncio.sleep(3)
         
         # Retry creation
-        response = requests.post(
+        response = await http.post(
             "https://api.github.com/user/repos",
-            headers=headers,
             json=payload
         )
         
@@ -97,12 +330,49 @@ def create_github_repo(repo_name: str, force_recreate: bool):
 
 
 
-def enable_github_pages(repo_name: str):
+async def reset_github_repo_async(repo_name: str, branch: str = "main"):
+    """
+    Reset an existing repo in place: force the branch to a fresh root commit
+    holding only the LICENSE, no delete / sleep / recreate.
+    """
+    tree_response = await http.get(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/trees/{branch}"
+    )
+    if tree_response.status_code != 200:
+        raise Exception(f"Failed to get tree: {tree_response.status_code}, {tree_response.text}")
+
+    license_items = [item for item in tree_response.json()["tree"] if item["path"] == "LICENSE"]
+    if not license_items:
+        raise Exception("No LICENSE in current tree")
+
+    new_tree_response = await http.post(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/trees",
+        json={"tree": [{"path": "LICENSE", "mode": "100644", "type": "blob", "sha": license_items[0]["sha"]}]}
+    )
+    if new_tree_response.status_code != 201:
+        raise Exception(f"Failed to create tree: {new_tree_response.status_code}, {new_tree_response.text}")
+
+    commit_response = await http.post(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/commits",
+        json={"message": "Initial commit", "tree": new_tree_response.json()["sha"], "parents": []}
+    )
+    if commit_response.status_code != 201:
+        raise Exception(f"Failed to create commit: {commit_response.status_code}, {commit_response.text}")
+
+    ref_response = await http.patch(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/refs/heads/{branch}",
+        json={"sha": commit_response.json()["sha"], "force": True}
+    )
+    if ref_response.status_code != 200:
+        raise Exception(f"Failed to update ref: {ref_response.status_code}, {ref_response.text}")
+
+    known_heads[repo_name] = (branch, commit_response.json()["sha"])
+    print(f"✅ Reset repo in place: {repo_name}")
+
+
+
+async def enable_github_pages_async(repo_name: str):
     """Enable GitHub Pages for the repository"""
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }
     
     payload = {
         "source": {
@@ -111,9 +381,8 @@ def enable_github_pages(repo_name: str):
         }
     }
     
-    response = requests.post(
+    response = await http.post(
         f"https://api.github.com/repos/{gh_user}/{repo_name}/pages",
-        headers=headers,
         json=payload
     )
     
@@ -126,14 +395,13 @@ def enable_github_pages(repo_name: str):
         return pages_url
     elif response.status_code == 409:
         # Pages already enabled, get the current status
-        get_response = requests.get(
-            f"https://api.github.com/repos/{gh_user}/{repo_name}/pages",
-            headers=headers
+        get_response = await http.get(
+            f"https://api.github.com/repos/{gh_user}/{repo_name}/pages"
         )
         if get_response.status_code == 200:
             pages_url = get_response.json().get("html_url", f"https://{gh_user}.github.io/{repo_name}/")
             print(f"GitHub Pages already enabled at: {pages_url}")
-            return get_response.json()
+            return pages_url
         else:
             raise Exception(f"Pages already enabled but failed to get info: {get_response.status_code}: {get_response.text}")
     else:
@@ -141,22 +409,91 @@ def enable_github_pages(repo_name: str):
 
 
 
-def push_files_to_repo(repo_name, files: list[dict], round:int):
-    # push files to github repo
-    if round == 2:
-        latest_sha = get_sha_of_latest_commit(repo_name)
+async def push_files_to_repo_async(repo_name, files: list[dict], round:int):
+    # push files to github repo, using the configured backend
+    if push_backend == "graphql":
+        head = known_heads.pop(repo_name, None)
+        if head is not None:
+            # single request; if the head moved since, re-read it below
+            try:
+                return await push_files_graphql_async(repo_name, files, round, head[1], head[0])
+            except Exception as e:
+                print(f"⚠️ GraphQL push at known head {head[1][:7]} failed, re-reading the head: {e}")
+        try:
+            return await push_files_graphql_async(repo_name, files, round)
+        except Exception as e:
+            print(f"⚠️ GraphQL push failed, falling back to REST: {e}")
+    elif push_backend == "git":
+        try:
+            return await push_files_git_async(repo_name, files, round)
+        except Exception as e:
+            print(f"⚠️ git push failed, falling back to REST: {e}")
+
+    return await push_files_rest_async(repo_name, files, round)
+
+
+
+def git_blob_sha(file_content) -> str:
+    """SHA-1 git gives a blob with this content (what a tree entry's `sha` holds)"""
+    data = file_content.encode("utf-8") if isinstance(file_content, str) else file_content
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+
+async def push_changed_files_async(repo_name, files: list[dict], current_files: dict, round:int):
+    """
+    Push only the files whose blob differs from the repo's current tree
+    (current_files as fetched by get_current_repo_files_async). If nothing
+    changed there is no commit and the head sha is returned as is.
+    """
+    current_shas = {path: git_blob_sha(content) for path, content in current_files.items()}
+    changed = [file for file in files if current_shas.get(file["name"]) != git_blob_sha(file["content"])]
+
+    unchanged = len(files) - len(changed)
+    if unchanged:
+        print(f"   {unchanged} file(s) unchanged, not pushed: {', '.join(file['name'] for file in files if file not in changed)}")
+    if not changed:
+        print("✅ Nothing changed, keeping the current head commit")
+        return await get_sha_of_latest_commit_async(repo_name)
+
+    return await push_files_to_repo_async(repo_name, changed, round)
+
+
+
+def is_inline_file(file_content) -> bool:
+    """Small text files go inline in the tree instead of through the blob API"""
+    return isinstance(file_content, str) and len(file_content.encode("utf-8")) <= push_inline_max_bytes
+
+
+
+async def create_blob_async(repo_name: str, file_name: str, file_content) -> str:
+    """Upload one blob, returns its sha"""
+    # Convert content to base64 if needed
+    if isinstance(file_content, bytes):
+        content_encoded = base64.b64encode(file_content).decode("utf-8")
     else:
-        latest_sha = None
-    # TODO : use cli to push
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }    
+        content_encoded = base64.b64encode(file_content.encode("utf-8")).decode("utf-8")
+
+    blob_payload = {
+        "content": content_encoded,
+        "encoding": "base64"
+    }
+    blob_response = await http.post(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/blobs",
+        json=blob_payload
+    )
+    if blob_response.status_code != 201:
+        raise Exception(f"Failed to create blob for {file_name}: {blob_response.status_code}, {blob_response.text}")
+    return blob_response.json()["sha"]
+
+
+
+async def push_files_rest_async(repo_name, files: list[dict], round:int):
+    """Push files with the Git Data API (blobs -> tree -> commit -> ref)"""
 
     # Step 1: Get the current commit SHA (HEAD of default branch)
-    repo_response = requests.get(
-        f"https://api.github.com/repos/{gh_user}/{repo_name}",
-        headers=headers
+    repo_response = await http.get(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}"
     )
     if repo_response.status_code != 200:
         raise Exception(f"Failed to get repo info: {repo_response.status_code}, {repo_response.text}")
@@ -169,15 +506,14 @@ def push_files_to_repo(repo_name, files: list[dict], round:int):
     max_retries = 5
     ref_response = None
     for attempt in range(max_retries):
-        ref_response = requests.get(
-            f"https://api.github.com/repos/{gh_user}/{repo_name}/git/ref/heads/{default_branch}",
-            headers=headers
+        ref_response = await http.get(
+            f"https://api.github.com/repos/{gh_user}/{repo_name}/git/ref/heads/{default_branch}"
         )
         if ref_response.status_code == 200:
             break
         if attempt < max_retries - 1:
             print(f"Waiting for branch to be ready... (attempt {attempt + 1}/{max_retries})")
-            time.sleep(2)
+            await asyncio.sleep(2)
     
     if ref_response.status_code != 200:
         raise Exception(f"Failed to get branch ref: {ref_response.status_code}, {ref_response.text}")    
@@ -186,58 +522,52 @@ def push_files_to_repo(repo_name, files: list[dict], round:int):
     latest_commit_sha = ref_response.json()["object"]["sha"]    
 
     # Step 2: Get the tree SHA from the latest commit
-    commit_response = requests.get(
-        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/commits/{latest_commit_sha}",
-        headers=headers
+    commit_response = await http.get(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/commits/{latest_commit_sha}"
     )
     if commit_response.status_code != 200:
         raise Exception(f"Failed to get commit: {commit_response.status_code}, {commit_response.text}")
     
     base_tree_sha = commit_response.json()["tree"]["sha"]    
 
-    # Step 3: Create blobs for each file
-    tree_items = []
-    for file in files:
+    # Step 3: Build tree entries. Small text files are sent inline as `content`
+    # (no blob round-trip), the rest get blobs created concurrently, unless a
+    # blob `sha` was already uploaded for the file (early push while streaming).
+    semaphore = asyncio.Semaphore(push_blob_concurrency)
+
+    async def build_tree_item(file: dict) -> dict:
         file_name = file.get("name")
         file_content = file.get("content")
-        
-        # Convert content to base64 if needed
-        if isinstance(file_content, bytes):
-            content_encoded = base64.b64encode(file_content).decode("utf-8")
+
+        if file.get("sha"):
+            blob_sha = file["sha"]
+        elif is_inline_file(file_content):
+            return {
+                "path": file_name,
+                "mode": "100644",  # regular file
+                "type": "blob",
+                "content": file_content
+            }
         else:
-            content_encoded = base64.b64encode(file_content.encode("utf-8")).decode("utf-8")
-        
-        # Create blob
-        blob_payload = {
-            "content": content_encoded,
-            "encoding": "base64"
-        }
-        blob_response = requests.post(
-            f"https://api.github.com/repos/{gh_user}/{repo_name}/git/blobs",
-            headers=headers,
-            json=blob_payload
-        )
-        if blob_response.status_code != 201:
-            raise Exception(f"Failed to create blob for {file_name}: {blob_response.status_code}, {blob_response.text}")
-        
-        blob_sha = blob_response.json()["sha"]
-        
-        # Add to tree
-        tree_items.append({
+            async with semaphore:
+                blob_sha = await create_blob_async(repo_name, file_name, file_content)
+
+        return {
             "path": file_name,
             "mode": "100644",  # regular file
             "type": "blob",
             "sha": blob_sha
-        })
+        }
+
+    tree_items = await asyncio.gather(*(build_tree_item(file) for file in files))
 
     # Step 4: Create a new tree
     tree_payload = {
         "base_tree": base_tree_sha,
-        "tree": tree_items
+        "tree": list(tree_items)
     }
-    tree_response = requests.post(
+    tree_response = await http.post(
         f"https://api.github.com/repos/{gh_user}/{repo_name}/git/trees",
-        headers=headers,
         json=tree_payload
     )
     if tree_response.status_code != 201:
@@ -251,9 +581,8 @@ def push_files_to_repo(repo_name, files: list[dict], round:int):
         "tree": new_tree_sha,
         "parents": [latest_commit_sha]
     }
-    new_commit_response = requests.post(
+    new_commit_response = await http.post(
         f"https://api.github.com/repos/{gh_user}/{repo_name}/git/commits",
-        headers=headers,
         json=commit_payload
     )
     if new_commit_response.status_code != 201:
@@ -266,9 +595,8 @@ def push_files_to_repo(repo_name, files: list[dict], round:int):
         "sha": new_commit_sha,
         "force": False  # Set to True if you want to force push
     }
-    update_ref_response = requests.patch(
+    update_ref_response = await http.patch(
         f"https://api.github.com/repos/{gh_user}/{repo_name}/git/refs/heads/{default_branch}",
-        headers=headers,
         json=update_ref_payload
     )
     if update_ref_response.status_code != 200:
@@ -278,18 +606,187 @@ def push_files_to_repo(repo_name, files: list[dict], round:int):
     return new_commit_sha
 
 
+async def github_graphql_async(query: str, variables: dict) -> dict:
+    """Run a GitHub GraphQL query/mutation, return its `data`"""
+    response = await http.post(
+        "https://api.github.com/graphql",
+        json={"query": query, "variables": variables}
+    )
+    if response.status_code != 200:
+        raise Exception(f"GraphQL request failed: {response.status_code}, {response.text}")
+
+    body = response.json()
+    if body.get("errors"):
+        raise Exception(f"GraphQL errors: {body['errors']}")
+    return body["data"]
+
+
+
+async def push_files_graphql_async(repo_name, files: list[dict], round:int, expected_head_oid: str = None, branch: str = None):
+    """
+    Push all files in one commit with the createCommitOnBranch mutation.
+    If the head oid (and branch) are already known the push is a single request.
+    """
+    if expected_head_oid is None or branch is None:
+        query = """
+        query($owner: String!, $name: String!) {
+            repository(owner: $owner, name: $name) {
+                defaultBranchRef { name target { oid } }
+            }
+        }"""
+        # default branch may not exist yet right after repo creation
+        max_retries = 5
+        for attempt in range(max_retries):
+            data = await github_graphql_async(query, {"owner": gh_user, "name": repo_name})
+            branch_ref = (data.get("repository") or {}).get("defaultBranchRef")
+            if branch_ref:
+                break
+            if attempt < max_retries - 1:
+                print(f"Waiting for branch to be ready... (attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(2)
+        else:
+            raise Exception(f"Failed to get default branch of {repo_name}")
+
+        branch = branch_ref["name"]
+        expected_head_oid = branch_ref["target"]["oid"]
+
+    additions = []
+    for file in files:
+        file_content = file.get("content")
+        if isinstance(file_content, str):
+            file_content = file_content.encode("utf-8")
+        additions.append({
+            "path": file.get("name"),
+            "contents": base64.b64encode(file_content).decode("utf-8")
+        })
+
+    mutation = """
+    mutation($input: CreateCommitOnBranchInput!) {
+        createCommitOnBranch(input: $input) { commit { oid } }
+    }"""
+    commit_input = {
+        "branch": {"repositoryNameWithOwner": f"{gh_user}/{repo_name}", "branchName": branch},
+        "message": {"headline": f"Round {round}: Add/Update {len(files)} file(s)"},
+        "fileChanges": {"additions": additions},
+        "expectedHeadOid": expected_head_oid
+    }
+    data = await github_graphql_async(mutation, {"input": commit_input})
+
+    new_commit_sha = data["createCommitOnBranch"]["commit"]["oid"]
+    known_heads[repo_name] = (branch, new_commit_sha)
+    print(f"Successfully pushed {len(files)} files in commit {new_commit_sha} (graphql)")
+    return new_commit_sha
+
+
+async def run_git_async(*args, git_dir: str, work_tree: str = None, env: dict = None) -> str:
+    """Run a git command against `git_dir`, return stripped stdout"""
+    command = ["git", f"--git-dir={git_dir}"]
+    if work_tree:
+        command.append(f"--work-tree={work_tree}")
+    command += list(args)
+
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0", **(env or {})}
+    if gh_token and args[0] in ("ls-remote", "fetch", "push"):
+        # auth as header, so the token never ends up in remote urls or error messages,
+        # and through the environment, so it isn't on the command line (ps, /proc/*/cmdline)
+        basic = base64.b64encode(f"x-access-token:{gh_token}".encode("utf-8")).decode("utf-8")
+        env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.extraHeader",
+            "GIT_CONFIG_VALUE_0": f"Authorization: Basic {basic}",
+        })
+
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"git {args[0]} failed: {stderr.decode('utf-8', errors='ignore').strip()}")
+    return stdout.decode("utf-8").strip()
+
+
+
+async def push_files_git_async(repo_name, files: list[dict], round:int):
+    """
+    Build the commit locally with the git CLI and push it as one packfile over smart HTTP.
+    Only the head commit and its trees are fetched (shallow, blob-less), never file contents.
+    """
+    remote = git_push_remote.format(user=gh_user, repo=repo_name)
+
+    with tempfile.TemporaryDirectory(prefix="push-") as workdir:
+        git_dir = os.path.join(workdir, "repo.git")
+        work_tree = os.path.join(workdir, "tree")
+        index_env = {"GIT_INDEX_FILE": os.path.join(workdir, "index")}
+
+        await run_git_async("init", "-q", "--bare", git_dir, git_dir=git_dir)
+        await run_git_async("remote", "add", "origin", remote, git_dir=git_dir)
+
+        # default branch, retried in case repo was just created
+        max_retries = 5
+        for attempt in range(max_retries):
+            symref = await run_git_async("ls-remote", "--symref", "origin", "HEAD", git_dir=git_dir)
+            if symref.startswith("ref: "):
+                break
+            if attempt < max_retries - 1:
+                print(f"Waiting for branch to be ready... (attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(2)
+        else:
+            raise Exception(f"Failed to get default branch of {repo_name}")
+        branch = symref.split()[1].removeprefix("refs/heads/")
+
+        await run_git_async("fetch", "-q", "--depth=1", "--filter=blob:none", "origin", branch, git_dir=git_dir)
+        parent_sha = await run_git_async("rev-parse", "FETCH_HEAD", git_dir=git_dir)
+        await run_git_async("read-tree", parent_sha, git_dir=git_dir, env=index_env)
+
+        # write new files, hash + stage them in one go
+        root = os.path.realpath(work_tree)
+        names = []
+        for file in files:
+            # file names come from the model, never let one escape the work tree
+            path = os.path.realpath(os.path.join(root, file.get("name")))
+            if os.path.isabs(file.get("name")) or not path.startswith(root + os.sep):
+                raise Exception(f"Refusing to push {file.get('name')!r}: path leaves the repository")
+            names.append(os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file_content = file.get("content")
+            with open(path, "wb") as f:
+                f.write(file_content if isinstance(file_content, bytes) else file_content.encode("utf-8"))
+        await run_git_async(
+            "add", "--", *names,
+            git_dir=git_dir, work_tree=work_tree, env=index_env
+        )
+
+        tree_sha = await run_git_async("write-tree", git_dir=git_dir, env=index_env)
+        author_env = {
+            "GIT_AUTHOR_NAME": gh_user or "bot",
+            "GIT_AUTHOR_EMAIL": f"{gh_user}@users.noreply.github.com",
+            "GIT_COMMITTER_NAME": gh_user or "bot",
+            "GIT_COMMITTER_EMAIL": f"{gh_user}@users.noreply.github.com",
+        }
+        new_commit_sha = await run_git_async(
+            "commit-tree", tree_sha, "-p", parent_sha, "-m", f"Round {round}: Add/Update {len(files)} file(s)",
+            git_dir=git_dir, env=author_env
+        )
+
+        # one receive-pack request: ref update + packfile with the new objects
+        await run_git_async("push", "-q", "origin", f"{new_commit_sha}:refs/heads/{branch}", git_dir=git_dir)
+
+    print(f"Successfully pushed {len(files)} files in commit {new_commit_sha} (git)")
+    return new_commit_sha
+
+
 # Delete repo on failure
-def delete_github_repo(repo_name: str):
+async def delete_github_repo_async(repo_name: str):
     """Delete a GitHub repository"""
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }
     
-    response = requests.delete(
-        f"https://api.github.com/repos/{gh_user}/{repo_name}",
-        headers=headers
+    response = await http.delete(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}"
     )
+    if response.status_code in (204, 404):
+        artifacts.forget(repo_name)
     
     if response.status_code == 204:
         print(f"✅ Successfully deleted repo: {repo_name}")
@@ -303,43 +800,51 @@ def delete_github_repo(repo_name: str):
 
 
 
-def get_current_repo_files(repo_name: str) -> dict:
+async def get_current_repo_files_async(repo_name: str, branch: str = "main") -> dict:
     """
     Fetch all current files from the repository
     Returns dict with filename: content
+    One recursive tree call, then the blobs concurrently. Binaries and
+    large files are skipped so they never end up in the prompt.
     """
-    headers = {
-        "Authorization": f"Bearer {gh_token}",
-        "Accept": "application/vnd.github+json"
-    }
-    
-    def get_files_recursive(path=""):
-        """Recursively get all files from repo"""
-        response = requests.get(
-            f"https://api.github.com/repos/{gh_user}/{repo_name}/contents/{path}",
-            headers=headers
-        )
-        
+    tree_response = await http.get(
+        f"https://api.github.com/repos/{gh_user}/{repo_name}/git/trees/{branch}?recursive=1"
+    )
+    if tree_response.status_code != 200:
+        raise Exception(f"Failed to get repo tree: {tree_response.status_code}, {tree_response.text}")
+
+    tree = tree_response.json()
+    if tree.get("truncated"):
+        print(f"⚠️ Tree of {repo_name} is truncated, some files will be missing")
+
+    wanted = []
+    for item in tree.get("tree", []):
+        if item["type"] != "blob":
+            continue
+        ext = os.path.splitext(item["path"])[1].lower()
+        if ext in binary_extensions or item.get("size", 0) > repo_fetch_max_bytes:
+            print(f"   skipping {item['path']} ({item.get('size', 0)} bytes)")
+            continue
+        wanted.append(item)
+
+    semaphore = asyncio.Semaphore(repo_fetch_concurrency)
+
+    async def get_blob(item: dict):
+        async with semaphore:
+            response = await http.get(
+                f"https://api.github.com/repos/{gh_user}/{repo_name}/git/blobs/{item['sha']}",
+                headers={"Accept": "application/vnd.github.raw+json"}
+            )
         if response.status_code != 200:
-            raise Exception(f"Failed to get files at {path}: {response.status_code}")
-        
-        items = response.json()
-        files = {}
-        
-        for item in items:
-            if item['type'] == 'file':
-                # Get file content
-                file_response = requests.get(item['download_url'])
-                if file_response.status_code == 200:
-                    files[item['path']] = file_response.text
-            elif item['type'] == 'dir':
-                # Recursively get files from subdirectory
-                subdir_files = get_files_recursive(item['path'])
-                files.update(subdir_files)
-        
-        return files
-    
-    return get_files_recursive()
+            raise Exception(f"Failed to get {item['path']}: {response.status_code}")
+        try:
+            return item["path"], response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            print(f"   skipping {item['path']} (not utf-8 text)")
+            return item["path"], None
+
+    results = await asyncio.gather(*(get_blob(item) for item in wanted))
+    return {path: content for path, content in results if content is not None}
 
 
 def get_default_gitignore() -> str:
@@ -390,11 +895,31 @@ credentials/
 """
 
 
+def get_default_readme(task_data: dict) -> str:
+    """README.md built from the task spec, used when the README call fails"""
+    task_id = task_data.get('task', 'unknown-task')
+    checks = "".join(f"- {check}\n" for check in task_data.get('checks', [])) or "- See the summary above\n"
+    return f"""# {task_id}
+
+## Summary
+{task_data.get('brief', '').strip()}
+
+## Requirements
+{checks}
+## Usage
+Open `index.html` in a browser, or visit the GitHub Pages URL of this repository.
+Data can be passed with URL parameters, e.g. `?url=...`.
+
+## License
+MIT License
+"""
+
+
 # sha required if want to update file, in round 2
-def get_sha_of_latest_commit(repo_name: str, branch: str = "main") -> str:
-    response = requests.get(f"https://api.github.com/repos/{gh_user}/{repo_name}/commits/{branch}")
+async def get_sha_of_latest_commit_async(repo_name: str, branch: str = "main") -> str:
+    response = await http.get(f"https://api.github.com/repos/{gh_user}/{repo_name}/commits/{branch}")
     if response.status_code != 200:
-        raise Exception("Failed to get latest commit sha: {response.status_code}, {response.text}")
+        raise Exception(f"Failed to get latest commit sha: {response.status_code}, {response.text}")
     return response.json().get("sha")
 
 
@@ -403,42 +928,793 @@ def get_sha_of_latest_commit(repo_name: str, branch: str = "main") -> str:
 # -------------------- GIT REPO STUFF --------------------------- #
 
 
+# -------------------- REPO POOL ---------------------------
+class RepoPool:
+    """
+    Keeps spare repos (auto_init + MIT license + Pages already enabled) ready, so
+    round 1 only has to rename one instead of create -> pages -> wait for branch.
+    Spares carry `marker` as their description, only those are ever adopted,
+    deleted or renamed.
+    """
+
+    marker = "Spare repo kept ready by the repo pool"
+
+    def __init__(self, size: int, refill_interval: float, refill_batch: int, max_age: float, prefix: str):
+        self.size = size
+        self.refill_interval = refill_interval
+        self.refill_batch = refill_batch
+        self.max_age = max_age
+        self.prefix = prefix
+        self.spares = []  # [{"name": ..., "created_at": epoch seconds}], oldest first
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.expired = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "spares": len(self.spares),
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "expired": self.expired,
+        }
+
+    async def discover(self):
+        """Adopt spares left over from a previous run (every page, expired ones get deleted by the next refill)"""
+        known = {spare["name"] for spare in self.spares}
+        url = "https://api.github.com/user/repos?affiliation=owner&sort=created&direction=asc&per_page=100"
+        while url:
+            response = await http.get(url)
+            if response.status_code != 200:
+                print(f"⚠️ Repo pool discovery failed: {response.status_code}")
+                break
+            for repo in response.json():
+                if repo["name"].startswith(self.prefix) and repo.get("description") == self.marker and repo["name"] not in known:
+                    created_at = datetime.fromisoformat(repo["created_at"].replace("Z", "+00:00")).timestamp()
+                    self.spares.append({"name": repo["name"], "created_at": created_at})
+                    known.add(repo["name"])
+            url = response.links.get("next", {}).get("url")
+        print(f"♻️ Repo pool: adopted {len(self.spares)} spare repo(s)")
+
+    async def create_spare(self):
+        name = f"{self.prefix}{uuid.uuid4().hex[:12]}"
+        await create_github_repo_async(name, False, description=self.marker)
+        await enable_github_pages_async(name)
+        self.spares.append({"name": name, "created_at": time.time()})
+        self.created += 1
+
+    async def refill_once(self):
+        # drop spares that are too old
+        now = time.time()
+        for spare in [spare for spare in self.spares if now - spare["created_at"] > self.max_age]:
+            self.spares.remove(spare)
+            self.expired += 1
+            await delete_github_repo_async(spare["name"])
+
+        missing = min(self.size - len(self.spares), self.refill_batch)
+        if missing > 0:
+            results = await asyncio.gather(*(self.create_spare() for _ in range(missing)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"⚠️ Repo pool refill failed: {result}")
+
+    async def run(self):
+        """Background refill loop"""
+        await self.discover()
+        while True:
+            try:
+                await self.refill_once()
+            except Exception as e:
+                print(f"⚠️ Repo pool refill failed: {e}")
+            await asyncio.sleep(self.refill_interval)
+
+    async def claim(self, repo_name: str):
+        """Rename a spare to repo_name, returns its pages url or None on a miss"""
+        now = time.time()
+        while self.spares:
+            spare = self.spares.pop(0)
+            if now - spare["created_at"] > self.max_age:
+                self.expired += 1
+                asyncio.create_task(delete_github_repo_async(spare["name"]))
+                continue
+
+            response = await http.patch(
+                f"https://api.github.com/repos/{gh_user}/{spare['name']}",
+                json={"name": repo_name, "description": ""}  # drop the marker, it's a task repo now
+            )
+            if response.status_code == 200:
+                self.hits += 1
+                print(f"♻️ Claimed spare repo {spare['name']} as {repo_name}")
+                return f"https://{gh_user}.github.io/{repo_name}/"
+
+            # name taken (e.g. a retry of an existing task), spare stays usable
+            if response.status_code == 422:
+                self.spares.insert(0, spare)
+            else:
+                print(f"⚠️ Failed to claim spare {spare['name']}: {response.status_code}: {response.text}")
+            break
+
+        self.misses += 1
+        return None
+
+
+repo_pool = RepoPool(
+    size=repo_pool_size,
+    refill_interval=repo_pool_refill_interval,
+    refill_batch=repo_pool_refill_batch,
+    max_age=repo_pool_max_age,
+    prefix=repo_pool_prefix,
+)
+
+# -------------------- REPO POOL --------------------------- #
+
+
+# -------------------- ARTIFACT STORE ---------------------------
+class ArtifactStore:
+    """
+    Local copy of the files this service pushed, per repo. Blobs are stored
+    content-addressed by their git blob sha (shared across repos and rounds),
+    plus one manifest per repo: {path: blob sha}, head sha, pages url.
+    """
+
+    def __init__(self, directory: str, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def blob_path(self, sha: str) -> str:
+        return os.path.join(self.directory, "blobs", sha[:2], sha)
+
+    def manifest_path(self, repo_name: str) -> str:
+        return os.path.join(self.directory, "repos", f"{repo_name}.json")
+
+    def write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def record(self, repo_name: str, files: dict, head_sha: str, pages_url: str = None, branch: str = "main"):
+        """Remember that `head_sha` of repo_name holds `files` ({path: content})"""
+        if not self.enabled:
+            return
+        tree = {}
+        for path, content in files.items():
+            sha = git_blob_sha(content)
+            if not os.path.exists(self.blob_path(sha)):
+                self.write(self.blob_path(sha), content.encode("utf-8") if isinstance(content, str) else content)
+            tree[path] = sha
+
+        manifest = {
+            "repo": repo_name,
+            "branch": branch,
+            "head_sha": head_sha,
+            "pages_url": pages_url,
+            "tree": tree,
+            "updated_at": time.time(),
+        }
+        self.write(self.manifest_path(repo_name), json.dumps(manifest).encode("utf-8"))
+
+    def load(self, repo_name: str):
+        """Manifest of a repo, or None"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self.manifest_path(repo_name), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def read_files(self, manifest: dict):
+        """{path: content} of a manifest, None if a blob is missing or not text"""
+        files = {}
+        for path, sha in manifest["tree"].items():
+            try:
+                with open(self.blob_path(sha), "rb") as f:
+                    files[path] = f.read().decode("utf-8")
+            except (FileNotFoundError, UnicodeDecodeError):
+                return None
+        return files
+
+    def forget(self, repo_name: str):
+        """Drop a repo's manifest (repo deleted / recreated), blobs stay shared"""
+        try:
+            os.remove(self.manifest_path(repo_name))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+
+
+artifacts = ArtifactStore(artifacts_dir, artifacts_enabled)
+
+
+async def get_head_sha_async(repo_name: str, branch: str = "main") -> str:
+    """Head commit sha of a branch from its ref (cheaper than the commits endpoint)"""
+    response = await http.get(f"https://api.github.com/repos/{gh_user}/{repo_name}/git/ref/heads/{branch}")
+    if response.status_code != 200:
+        raise Exception(f"Failed to get branch ref: {response.status_code}, {response.text}")
+    head_sha = response.json()["object"]["sha"]
+    known_heads[repo_name] = (branch, head_sha)
+    return head_sha
+
+
+async def get_repo_files_async(repo_name: str) -> dict:
+    """
+    Current files of a repo for round 2: from the artifact store when the
+    remote head is still the commit recorded there (one ref call), else fetched.
+    """
+    manifest = artifacts.load(repo_name)
+    if manifest is not None:
+        try:
+            head_sha = await get_head_sha_async(repo_name, manifest["branch"])
+        except Exception as e:
+            head_sha = None
+            print(f"⚠️ {e}")
+        files = artifacts.read_files(manifest) if head_sha == manifest["head_sha"] else None
+        if files is not None:
+            artifacts.hits += 1
+            print(f"📦 Using local artifacts of {repo_name} at {head_sha[:7]} ({len(files)} files)")
+            return files
+        print(f"📦 Local artifacts of {repo_name} don't match the remote head ({head_sha}), fetching")
+    artifacts.misses += 1
+    if push_backend != "graphql":
+        return await get_current_repo_files_async(repo_name)
+    # read the head alongside the tree, the push then needs no query of its own
+    async def read_head():
+        try:
+            await get_head_sha_async(repo_name)
+        except Exception as e:
+            print(f"⚠️ {e}")
+
+    files, _ = await asyncio.gather(get_current_repo_files_async(repo_name), read_head())
+    return files
+
+# -------------------- ARTIFACT STORE --------------------------- #
+
+
 # -------------------------- LLM --------------------------- 
-def call_aipipe_llm(messages: list=[], model: str = "gpt-4o-mini") -> str:
-    
-    url = "https://aipipe.org/openrouter/v1/chat/completions"
-    
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
+class LLMCache:
+    """
+    Content-addressed on-disk cache of LLM responses, keyed on a hash of
+    (model, messages, temperature, max_tokens). Size bounded, least recently
+    used entries (by mtime, bumped on every hit) are evicted first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.total_bytes = None  # computed lazily on first write
+
+    def key(self, payload: dict) -> str:
+        fields = {name: payload.get(name) for name in ("model", "messages", "temperature", "max_tokens")}
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def get(self, payload: dict):
+        path = self.path(self.key(payload))
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return text
+
+    def put(self, payload: dict, text: str):
+        path = self.path(self.key(payload))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, _, size in self.entries())
+            else:
+                self.total_bytes += os.path.getsize(path) - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def discard(self, payload: dict):
+        """Drop an entry, e.g. a response that turned out to be unusable"""
+        path = self.path(self.key(payload))
+        with self.lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            if self.total_bytes is not None:
+                self.total_bytes -= size
+
+    def entries(self) -> list:
+        """[(mtime, path, size)] of every cached response"""
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".txt"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        return entries
+
+    def evict(self):
+        """Trim to 90% of max_bytes so a full cache is not re-walked on every put"""
+        entries = sorted(self.entries())
+        self.total_bytes = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if self.total_bytes <= target:
+                break
+            os.remove(path)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+llm_cache = LLMCache(llm_cache_dir, llm_cache_max_bytes, llm_cache_enabled)
+
+
+
+def llm_payload(messages: list, model: str = "gpt-4o-mini") -> dict:
+    return {
         "model": model,
         "messages": messages,
         "temperature": 0.3,
         "max_tokens": 8000
     }
-    
+
+
+
+def get_output_format(task_data: dict) -> str:
+    """Wire format the model answers in for this task: "json" or "blocks" """
+    output_format = (task_data.get('output_format') or llm_output_format).lower()
+    if output_format not in ("json", "blocks"):
+        print(f"⚠️ Unknown output_format '{output_format}', using json")
+        return "json"
+    return output_format
+
+
+def get_update_mode(task_data: dict) -> str:
+    """How round 2 asks for changes: "full" files or "edits" """
+    update_mode = (task_data.get('update_mode') or llm_update_mode).lower()
+    if update_mode not in ("full", "edits"):
+        print(f"⚠️ Unknown update_mode '{update_mode}', using full")
+        return "full"
+    return update_mode
+
+
+def file_blocks_instructions(example_files: dict) -> str:
+    """Prompt section for the "blocks" format, example_files maps name -> placeholder content"""
+    example = "\n".join(f"=== FILE: {name} ===\n{content}" for name, content in example_files.items())
+    return f"""OUTPUT FORMAT (CRITICAL - FILE BLOCKS ONLY):
+Return every file as a raw block: a header line `=== FILE: <path> ===`, then the file content
+exactly as it should be saved (NOT escaped, NOT inside markdown code blocks). After the last file
+write the line `=== END ===`. No explanatory comments or any wrapper text.
+
+{example}
+=== END ===
+
+IMPORTANT: Return the file blocks only, with COMPLETE file contents, and always finish with `=== END ===`."""
+
+
+
+class LatencyHistogram:
+    """
+    Per model latency histograms (log-spaced buckets, 50 ms .. ~10 min) for
+    full responses and streamed first tokens. Their percentiles set the hedge delay.
+    """
+
+    bounds = [0.05 * 1.25 ** i for i in range(43)]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}  # (model, kind) -> bucket counts
+        self.hedges = {}  # model -> hedges fired while waiting on it
+        self.wins = {}    # model -> hedged races it won
+
+    def record(self, model: str, kind: str, seconds: float):
+        with self.lock:
+            counts = self.counts.setdefault((model, kind), [0] * (len(self.bounds) + 1))
+            counts[bisect.bisect_left(self.bounds, seconds)] += 1
+
+    def percentile(self, model: str, kind: str, percentile: float):
+        """Upper bound of the bucket holding the percentile, None below llm_hedge_min_samples"""
+        with self.lock:
+            counts = list(self.counts.get((model, kind), []))
+        total = sum(counts)
+        if total < max(llm_hedge_min_samples, 1):
+            return None
+        rank = total * percentile / 100
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+    def hedge_delay(self, model: str, kind: str) -> float:
+        observed = self.percentile(model, kind, llm_hedge_percentile)
+        return llm_hedge_default_delay if observed is None else observed
+
+    def hedged(self, model: str):
+        with self.lock:
+            self.hedges[model] = self.hedges.get(model, 0) + 1
+
+    def won(self, model: str):
+        with self.lock:
+            self.wins[model] = self.wins.get(model, 0) + 1
+
+    def stats(self) -> dict:
+        stats = {}
+        for model, kind in list(self.counts):
+            entry = stats.setdefault(model, {"hedges": self.hedges.get(model, 0), "hedge_wins": self.wins.get(model, 0)})
+            entry[kind] = {
+                "count": sum(self.counts[(model, kind)]),
+                "p50": self.percentile(model, kind, 50),
+                "p95": self.percentile(model, kind, 95),
+                "p99": self.percentile(model, kind, 99),
+                "hedge_delay": self.hedge_delay(model, kind),
+            }
+        return stats
+
+
+llm_latency = LatencyHistogram()
+
+
+
+async def request_completion_async(payload: dict, url: str = llm_url) -> tuple:
+    """One chat completion, returns (content, finish_reason)"""
+    start = time.perf_counter()
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=500)
+        response = await http.post(url, json=payload, timeout=llm_timeout)
         response.raise_for_status()
         
         data = response.json()
         
         # Extract the message content from OpenAI-format response
         if 'choices' in data and len(data['choices']) > 0:
-            return data['choices'][0]['message']['content']
+            choice = data['choices'][0]
+            llm_latency.record(payload["model"], "response", time.perf_counter() - start)
+            return choice['message']['content'], choice.get('finish_reason')
         else:
             raise Exception(f"Unexpected response format: {data}")
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Error calling aipipe API: {str(e)}")
 
 
 
-def write_code_with_llm(task_data: dict) -> dict:
+async def request_completion_stream_async(payload: dict, on_text=None, url: str = llm_url) -> tuple:
+    """One streamed (SSE) chat completion, on_text(delta) per chunk, returns (content, finish_reason)"""
+    start = time.perf_counter()
+    first_token_at = None
+    finish_reason = None
+    parts = []
+    try:
+        async with http.stream("POST", url, json={**payload, "stream": True}, timeout=llm_timeout) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(f"Error calling aipipe API: {response.status_code}, {response.text}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue  # blank lines / ": keep-alive" comments
+                event = line[len("data:"):].strip()
+                if event == "[DONE]":
+                    break
+
+                try:
+                    choice = (json.loads(event).get("choices") or [{}])[0]
+                except json.JSONDecodeError:
+                    raise Exception(f"Malformed SSE event from aipipe API: {event[:200]}")
+                finish_reason = choice.get("finish_reason") or finish_reason
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    llm_latency.record(payload["model"], "first_token", first_token_at - start)
+                    print(f"⏱️ Time to first token: {(first_token_at - start) * 1000:.0f} ms")
+                parts.append(delta)
+                if on_text:
+                    on_text(delta)
+
+    except httpx.HTTPError as e:
+        raise Exception(f"Error calling aipipe API: {str(e)}")
+
+    content = "".join(parts)
+    print(f"⏱️ Full response: {(time.perf_counter() - start) * 1000:.0f} ms, {len(content)} characters")
+    return content, finish_reason
+
+
+
+async def hedged_completion_async(payload: dict, on_text=None) -> tuple:
+    """
+    One completion (streamed when on_text is given), hedged: if the model has not
+    answered within its latency percentile (first token when streamed), or fails,
+    the same request goes to llm_hedge_model too. The first answer wins, the
+    other request is cancelled. Returns (content, finish_reason).
+    """
+    def request(payload: dict, url: str, on_text=None):
+        if on_text is None:
+            return request_completion_async(payload, url)
+        return request_completion_stream_async(payload, on_text, url)
+
+    model = payload["model"]
+    if not llm_hedge_model or llm_hedge_model == model:
+        return await request(payload, llm_url, on_text)
+
+    kind = "first_token" if on_text else "response"
+    delay = llm_latency.hedge_delay(model, kind)
+    models = {}
+    started = {}
+    cut_short = set()
+    winner = []
+    first_token = asyncio.Event()
+
+    def cancel(task):
+        """
+        Stop a candidate that lost (or is abandoned). Its elapsed time is a lower
+        bound on its latency and is recorded, else only fast answers reach the
+        histogram and the hedge delay keeps shrinking.
+        """
+        if task.done() or task in cut_short:
+            return
+        cut_short.add(task)
+        llm_latency.record(models[task], kind, time.perf_counter() - started[task])
+        task.cancel()
+
+    def relay(task_model: str):
+        """on_text of one candidate: the first to stream a token owns on_text"""
+        if on_text is None:
+            return None
+        def handler(delta: str):
+            if not winner:
+                winner.append(task_model)
+                first_token.set()
+            if winner[0] == task_model:
+                on_text(delta)
+        return handler
+
+    def start(task_model: str, url: str):
+        task = asyncio.create_task(request({**payload, "model": task_model}, url, relay(task_model)))
+        models[task] = task_model
+        started[task] = time.perf_counter()
+        return task
+
+    pending = {start(model, llm_url)}
+    first_token_task = asyncio.create_task(first_token.wait())
+    errors = []
+    try:
+        while pending:
+            hedged = len(models) > 1
+            done, _ = await asyncio.wait(
+                pending | {first_token_task},
+                timeout=None if hedged else delay,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                print(f"🪁 No {kind.replace('_', ' ')} from {model} after {delay:.1f}s, hedging with {llm_hedge_model}")
+                llm_latency.hedged(model)
+                pending.add(start(llm_hedge_model, llm_hedge_url))
+                continue
+
+            if first_token_task in done:
+                # streamed: the first token decides, the winner keeps streaming
+                task = next(task for task, task_model in models.items() if task_model == winner[0])
+                return await finish_hedge(task, models, pending, cancel)
+
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None and task.result()[0]:
+                    return await finish_hedge(task, models, pending, cancel)
+                errors.append(f"{models[task]}: {task.exception() or 'empty response'}")
+                if not hedged:
+                    print(f"🪁 {model} failed, falling back to {llm_hedge_model}")
+                    llm_latency.hedged(model)
+                    pending.add(start(llm_hedge_model, llm_hedge_url))
+
+        raise Exception(f"All hedged LLM requests failed: {'; '.join(errors)}")
+    finally:
+        first_token_task.cancel()
+        for task in models:
+            cancel(task)
+
+
+async def finish_hedge(task, models: dict, pending: set, cancel) -> tuple:
+    """Cancel the losers of a hedged request, wait for the winner"""
+    for loser in pending - {task}:
+        cancel(loser)
+    if len(models) > 1:
+        print(f"🪁 {models[task]} answered first, cancelled the other request")
+        llm_latency.won(models[task])
+    return await task
+
+
+
+def continuation_messages(messages: list, partial: str) -> list:
+    """The original conversation + the cut-off answer + a request to carry on from its last character"""
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": (
+            "Your previous response was cut off. Continue EXACTLY from the last character: "
+            "do not repeat anything, do not start over, no commentary or code blocks, just the remaining text."
+        )},
+    ]
+
+
+def strip_overlap(partial: str, continuation: str) -> str:
+    """continuation minus any leading text that repeats the end of partial"""
+    longest = min(continuation_overlap_window, len(partial), len(continuation))
+    for size in range(longest, continuation_min_overlap - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+
+class ContinuationStream:
+    """
+    on_text adapter for a streamed continuation: holds back the first chunk of
+    text until the overlap with the partial answer is known, then passes deltas through.
+    """
+
+    def __init__(self, partial: str, on_text):
+        self.partial = partial
+        self.on_text = on_text
+        self.head = ""
+        self.flushed = False
+
+    def __call__(self, delta: str):
+        if self.flushed:
+            self.on_text(delta)
+            return
+        self.head += delta
+        if len(self.head) >= continuation_overlap_window:
+            self.flush()
+
+    def flush(self):
+        if self.flushed:
+            return
+        self.flushed = True
+        rest = strip_overlap(self.partial, self.head)
+        if rest:
+            self.on_text(rest)
+
+
+async def complete_with_continuations_async(messages: list, model: str, on_text=None) -> str:
+    """
+    Chat completion that survives max_tokens: while finish_reason is "length",
+    ask the model to continue and append to the partial answer. Raises if the
+    answer is still cut off after llm_max_continuations, so the caller regenerates.
+    Streams (on_text per delta) when on_text is given.
+    """
+    content, finish_reason = await hedged_completion_async(llm_payload(messages, model), on_text)
+
+    continuations = 0
+    while finish_reason == "length":
+        if continuations >= llm_max_continuations:
+            raise Exception(f"LLM response still truncated after {continuations} continuation(s), {len(content)} characters")
+        continuations += 1
+        print(f"✂️ Response cut off at {len(content)} characters, continuing ({continuations}/{llm_max_continuations})...")
+
+        stream = ContinuationStream(content, on_text) if on_text else None
+        more, finish_reason = await hedged_completion_async(llm_payload(continuation_messages(messages, content), model), stream)
+        if stream:
+            stream.flush()
+        content += strip_overlap(content, more)
+
+    return content
+
+
+
+def edit_blocks_instructions() -> str:
+    """Prompt section for round 2 "edits" mode (parsed by apply_edit_response)"""
+    return """RESPONSE FORMAT (CRITICAL - EDIT BLOCKS ONLY):
+For every file that changes write a header line `=== EDIT: <path> ===` followed by one or more edits:
+<<<<<<< SEARCH
+lines copied EXACTLY from the current file (with indentation), enough of them to be unique
+=======
+the lines that replace them
+>>>>>>> REPLACE
+Keep each edit small: only the lines that change plus a line or two of context. An empty SEARCH
+appends to the file. To create a new file or rewrite one entirely, use `=== FILE: <path> ===`
+followed by its complete content instead. Do not include files that do not change. After the last
+block write the line `=== END ===`. No explanatory comments or any wrapper text.
+
+=== EDIT: index.html ===
+<<<<<<< SEARCH
+    <h1>Old title</h1>
+=======
+    <h1>New title</h1>
+    <p id="subtitle">New subtitle</p>
+>>>>>>> REPLACE
+=== EDIT: README.md ===
+<<<<<<< SEARCH
+## Features
+=======
+## Features
+- Subtitle under the title
+>>>>>>> REPLACE
+=== END ===
+
+IMPORTANT: Return the edit blocks only and always finish with `=== END ===`."""
+
+
+
+async def call_aipipe_llm_async(messages: list=[], model: str = "gpt-4o-mini", use_cache: bool = True) -> str:
+    
+    payload = llm_payload(messages, model)
+
+    use_cache = use_cache and llm_cache.enabled
+    if use_cache:
+        cached = llm_cache.get(payload)
+        if cached is not None:
+            print("⚡ LLM cache hit")
+            return cached
+    
+    content = await complete_with_continuations_async(messages, model)
+
+    if use_cache:
+        llm_cache.put(payload, content)
+    return content
+
+
+
+async def call_aipipe_llm_stream_async(messages: list=[], model: str = "gpt-4o-mini", on_text=None, use_cache: bool = True) -> str:
+    """
+    Same as call_aipipe_llm_async, but streamed (SSE): on_text(delta) is called
+    with every chunk as it arrives. Returns the full response text.
+    """
+    payload = llm_payload(messages, model)
+
+    use_cache = use_cache and llm_cache.enabled
+    if use_cache:
+        cached = llm_cache.get(payload)
+        if cached is not None:
+            print("⚡ LLM cache hit")
+            if on_text:
+                on_text(cached)
+            return cached
+
+    content = await complete_with_continuations_async(messages, model, on_text or (lambda delta: None))
+
+    if use_cache:
+        llm_cache.put(payload, content)
+    return content
+
+
+
+async def write_code_with_llm_async(task_data: dict, on_file=None, index_only: bool = False) -> dict:
     
+    if not index_only and (llm_split_files or task_data.get('split_files')):
+        return await write_code_split_with_llm_async(task_data, on_file)
+
     print("🧠 Calling API to create round 1 code...")
     # Extract task information
     task_id = task_data.get('task', 'unknown-task')
@@ -448,6 +1724,59 @@ def write_code_with_llm(task_data: dict) -> dict:
     # Format checks
     checks_formatted = "\n".join([f"{i+1}. {check}" for i, check in enumerate(checks)])
     
+    output_format = get_output_format(task_data)
+    if output_format == "blocks":
+        example_files = {
+            "index.html": "<!DOCTYPE html>\n<html lang=\"en\">\n<head>...</head>\n<body>...</body>\n</html>",
+            "README.md": "# Project Title\n\n## Summary\n...\n## License\nMIT License...",
+            ".gitignore": "node_modules/\n.env\n.DS_Store",
+        }
+        if index_only:
+            example_files = {"index.html": example_files["index.html"]}
+        output_instructions = file_blocks_instructions(example_files)
+    elif index_only:
+        output_instructions = """OUTPUT FORMAT (CRITICAL - PURE JSON ONLY):
+    Return ONLY this JSON structure with no markdown code blocks, no explanatory comments or any wrapper text.
+    DO NOT ADD ANY COMMENTS. 
+
+    {
+    "files": {
+        "index.html": "<!DOCTYPE html>\\n<html lang=\\"en\\">\\n<head>...</head>\\n<body>...</body>\\n</html>"
+    },
+    "description": "Brief one-line description"
+    }
+
+    IMPORTANT: Return the raw JSON object only, with COMPLETE file contents. Do not use markdown code blocks or any wrapper text."""
+    else:
+        output_instructions = """OUTPUT FORMAT (CRITICAL - PURE JSON ONLY):
+    Return ONLY this JSON structure with no markdown code blocks, no explanatory comments or any wrapper text.
+    DO NOT ADD ANY COMMENTS. 
+
+    {
+    "files": {
+        "index.html": "<!DOCTYPE html>\\n<html lang=\\"en\\">\\n<head>...</head>\\n<body>...</body>\\n</html>",
+        "README.md": "# Project Title\\n\\n## Summary\\n...\\n## License\\nMIT License...",
+        ".gitignore": "node_modules/\\n.env\\n.DS_Store"
+    },
+    "description": "Brief one-line description"
+    }
+
+    IMPORTANT: Return the raw JSON object only, with COMPLETE file contents. Do not use markdown code blocks or any wrapper text."""
+    
+    if index_only:
+        file_requirements = """FILE REQUIREMENTS:
+    1. index.html - Complete working app at root (not in subfolder)
+    Return ONLY index.html, README.md and .gitignore are written separately."""
+    else:
+        file_requirements = """FILE REQUIREMENTS:
+    1. index.html - Complete working app at root (not in subfolder)
+    3. README.md - Professional, with:
+    - Project summary
+    - How to use (open index.html or GitHub Pages URL)
+    - How to pass URL parameters (?url=...)
+    - MIT License included
+    4. .gitignore - Basic ignore file"""
+
     system_prompt = f" You are a highly skilled web developer specializing in full-stack development. Your objective is to create a complete single-page web application according to the specifications provided. "
     prompt = f""" 
     You must create a standalone index.html file containing all required HTML markup, CSS styling, and JavaScript functionality.
@@ -468,33 +1797,13 @@ def write_code_with_llm(task_data: dict) -> dict:
         - For non-image attachments, process them according to the provided handling rules.
 
 
-    FILE REQUIREMENTS:
-    1. index.html - Complete working app at root (not in subfolder)
-    3. README.md - Professional, with:
-    - Project summary
-    - How to use (open index.html or GitHub Pages URL)
-    - How to pass URL parameters (?url=...)
-    - MIT License included
-    4. .gitignore - Basic ignore file
+    {file_requirements}
 
     CODE QUALITY:
     • Write COMPLETE, FUNCTIONAL code (no TODOs or placeholders)
     • Handle errors gracefully
 
-    OUTPUT FORMAT (CRITICAL - PURE JSON ONLY):
-    Return ONLY this JSON structure with no markdown code blocks, no explanatory comments or any wrapper text.
-    DO NOT ADD ANY COMMENTS. 
-
-    {{
-    "files": {{
-        "index.html": "<!DOCTYPE html>\\n<html lang=\\"en\\">\\n<head>...</head>\\n<body>...</body>\\n</html>",
-        "README.md": "# Project Title\\n\\n## Summary\\n...\\n## License\\nMIT License...",
-        ".gitignore": "node_modules/\\n.env\\n.DS_Store"
-    }},
-    "description": "Brief one-line description"
-    }}
-
-    IMPORTANT: Return the raw JSON object only, with COMPLETE file contents. Do not use markdown code blocks or any wrapper text.
+    {output_instructions}
 
     EXAMPLE for index.html:
     <!DOCTYPE html>
@@ -517,6 +1826,7 @@ def write_code_with_llm(task_data: dict) -> dict:
 
 
     content = build_multimodal_messages(prompt, task_data.get('attachments'))
+    response_text = ""
 
     try:
         print(f"📝 Prompt length: {len(prompt)} characters")
@@ -527,11 +1837,25 @@ def write_code_with_llm(task_data: dict) -> dict:
             {"role": "system", "content": [{"type": "text", "text": system_prompt} ]},
             content
         ]
-        response_text = call_aipipe_llm(messages)
+        if llm_stream or task_data.get('stream'):
+            # emit every file as soon as its string / block closes in the stream
+            parser = FileBlockStreamParser() if output_format == "blocks" else FilesStreamParser()
+            start = time.perf_counter()
+
+            def on_text(delta: str):
+                for filename, file_content in parser.feed(delta):
+                    if len(parser.emitted) == 1:
+                        print(f"⏱️ Time to first file ({filename}): {(time.perf_counter() - start) * 1000:.0f} ms")
+                    if on_file:
+                        on_file(filename, file_content)
+
+            response_text = await call_aipipe_llm_stream_async(messages, on_text=on_text, use_cache=not task_data.get('no_cache'))
+        else:
+            response_text = await call_aipipe_llm_async(messages, use_cache=not task_data.get('no_cache'))
         
-        # Parse JSON from response
-        print("🔍 Extracting JSON...")
-        code_structure = extract_json_from_response(response_text)
+        # Parse JSON / file blocks from response
+        print(f"🔍 Extracting files ({output_format})...")
+        code_structure = extract_code_structure(response_text, output_format)
         
         # Validate structure
         if not isinstance(code_structure, dict):
@@ -562,6 +1886,8 @@ def write_code_with_llm(task_data: dict) -> dict:
         return code_structure
         
     except json.JSONDecodeError as e:
+        # don't serve the same broken response to the retry
+        llm_cache.discard(llm_payload(messages))
         print(f"❌ JSON parsing failed: {e}")
         print(f"   Response length: {len(response_text)}")
         print(f"   First 200 chars: {response_text[:200]}")
@@ -570,14 +1896,179 @@ def write_code_with_llm(task_data: dict) -> dict:
         raise Exception(f"Error parsing LLM JSON response: {str(e)}")
         
     except Exception as e:
+        llm_cache.discard(llm_payload(messages))
         print(f"❌ Error generating code: {e}")
         raise Exception(f"Error generating code with LLM: {str(e)}")
 
 
 
-def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
+async def write_readme_with_llm_async(task_data: dict) -> str:
+    """README.md from the task spec alone, so it can be written while index.html is generated"""
+    task_id = task_data.get('task', 'unknown-task')
+    brief = task_data.get('brief', '')
+    checks = task_data.get('checks', [])
+    attachments = task_data.get('attachments') or []
+
+    checks_formatted = "\n".join([f"{i+1}. {check}" for i, check in enumerate(checks)])
+    attachments_formatted = ", ".join(attachment.get('name', 'unnamed') for attachment in attachments) or "none"
+
+    system_prompt = "You are a technical writer documenting single-page web applications."
+    prompt = f"""
+    Write README.md for the web application below. The app (a standalone index.html published on GitHub Pages)
+    is being written at the same time from the same specification, so document what the specification asks for.
+
+    TASK: {task_id}
+    DESCRIPTION: {brief}
+
+    REQUIREMENTS:
+    {checks_formatted}
+
+    ATTACHMENTS: {attachments_formatted}
+
+    README.md - Professional, with:
+    - Project summary
+    - How to use (open index.html or GitHub Pages URL)
+    - How to pass URL parameters (?url=...)
+    - MIT License included
+
+    Return ONLY the raw markdown of README.md, no markdown code blocks around it or any wrapper text.
+    """
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    readme = (await call_aipipe_llm_async(messages, use_cache=not task_data.get('no_cache'))).strip()
+    fenced = file_block_fence_pattern.fullmatch(readme)
+    if fenced:
+        readme = fenced.group(1)
+    if not readme:
+        llm_cache.discard(llm_payload(messages))
+        raise Exception("LLM returned an empty README.md")
+    return readme + "\n"
+
+
+
+async def write_code_split_with_llm_async(task_data: dict, on_file=None) -> dict:
+    """
+    Round 1 as concurrent per-file calls: index.html and a spec-only README.md,
+    .gitignore from the local default. Wall time is the slower of the two calls.
+    """
+    start = time.perf_counter()
+    timings = {}
+
+    async def timed(name: str, coro):
+        result = await coro
+        timings[name] = time.perf_counter() - start
+        return result
+
+    async def readme():
+        try:
+            content = await timed("README.md", write_readme_with_llm_async(task_data))
+        except Exception as e:
+            # never fail (and so retry) the expensive index.html call over the README
+            print(f"⚠️ README.md generation failed ({e}), using the local template")
+            content = get_default_readme(task_data)
+        if on_file:
+            on_file("README.md", content)
+        return content
+
+    print("🧠 Generating index.html and README.md in parallel...")
+    tasks = [
+        asyncio.create_task(timed("index.html", write_code_with_llm_async(task_data, on_file, index_only=True))),
+        asyncio.create_task(readme()),
+    ]
+    try:
+        code_structure, readme_content = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    code_structure["files"]["README.md"] = readme_content
+    code_structure["files"].setdefault(".gitignore", get_default_gitignore())
+    print(
+        "⏱️ Per-file generation: "
+        + ", ".join(f"{name} {elapsed:.1f}s" for name, elapsed in timings.items())
+        + f", wall {time.perf_counter() - start:.1f}s"
+    )
+    return code_structure
 
-    print("🧠 Calling API for round 2 ...")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for code / English)"""
+    return (len(text) + 3) // 4
+
+
+def build_files_context(current_files: dict, budget: int = None) -> tuple:
+    """
+    Current files for a round 2 prompt, within `budget` tokens: index.html and
+    README.md in full, low-value files (LICENSE, lockfiles, ...) and binaries
+    only listed, the rest smallest first while they fit, then a head excerpt
+    of the first one that doesn't. Every decision is logged.
+    Returns (context, withheld): the paths the model did not see in full.
+    """
+    budget = round2_context_tokens if budget is None else budget
+    required = [name for name in ("index.html", "README.md") if name in current_files]
+    others = sorted((name for name in current_files if name not in required), key=lambda name: len(current_files[name]))
+
+    sections = []
+    decisions = []
+    withheld = set()
+    used = 0
+    for filename in required + others:
+        content = current_files[filename]
+        tokens = estimate_tokens(content)
+        name = os.path.basename(filename).lower()
+        low_value = name in low_value_files or name.endswith(low_value_suffixes) or os.path.splitext(name)[1] in binary_extensions
+
+        if filename in required or (not low_value and used + tokens <= budget):
+            decision = "full"
+            sections.append(f"=== {filename} ===\n{content}")
+            used += tokens
+        elif low_value:
+            decision = "listed"
+            sections.append(f"=== {filename} === (omitted: {len(content)} characters, keep unchanged, do not return it)")
+        elif budget - used >= 500:
+            # a head excerpt of what still fits, cut at a line boundary
+            excerpt = content[:(budget - used) * 4]
+            excerpt = excerpt[:excerpt.rfind("\n") + 1] or excerpt
+            decision = "excerpt"
+            sections.append(
+                f"=== {filename} === (only the first {len(excerpt)} of {len(content)} characters shown, "
+                f"keep the rest unchanged, never return it as a complete file)\n{excerpt}"
+            )
+            used += estimate_tokens(excerpt)
+        else:
+            decision = "listed"
+            sections.append(
+                f"=== {filename} === (omitted: {len(content)} characters, over the context budget, keep unchanged, do not return it)"
+            )
+        if decision != "full":
+            withheld.add(filename)
+        decisions.append((filename, decision, tokens))
+
+    print(f"📚 Round 2 context: ~{used} / {budget} tokens")
+    for filename, decision, tokens in decisions:
+        print(f"   {decision:<8} {filename} (~{tokens} tokens)")
+    if used > budget:
+        print("⚠️ index.html + README.md alone exceed the round 2 context budget")
+    return "\n\n".join(sections), withheld
+
+
+
+async def write_code_update_with_llm_async(task_data: dict, current_files: dict, edits: bool = None) -> dict:
+
+    if edits is None and get_update_mode(task_data) == "edits":
+        try:
+            return await write_code_update_with_llm_async(task_data, current_files, edits=True)
+        except Exception as e:
+            print(f"⚠️ Edit-based update failed, retrying with complete files: {e}")
+    edits = bool(edits)
+
+    print(f"🧠 Calling API for round 2 ({'edits' if edits else 'complete files'})...")
     task_id = task_data.get('task', 'unknown-task')
     brief = task_data.get('brief', '')
     checks = task_data.get('checks', [])
@@ -585,15 +2076,40 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
     checks_formatted = "\n".join([f"- {check}" for check in checks])
     
 
-    current_files_formatted = []
-    for filename, content in current_files.items():
-        current_files_formatted.append(f"=== {filename} ===\n{content}")
+    current_files_str, withheld = build_files_context(current_files)
     
-    current_files_str = "\n\n".join(current_files_formatted)
+    if edits:
+        deliverable = "the edits that update the code"
+        task_step = "Write SEARCH/REPLACE edits for every file that changes"
+        quality_rule = "Return ONLY the changed parts as SEARCH/REPLACE edits (not complete files)"
+    else:
+        deliverable = "final, complete, updated code"
+        task_step = "Generate COMPLETE updated files with full content"
+        quality_rule = "Return COMPLETE file contents (not diffs or partial updates)"
+
+    output_format = get_output_format(task_data)
+    if edits:
+        output_instructions = edit_blocks_instructions()
+    elif output_format == "blocks":
+        output_instructions = file_blocks_instructions({
+            "index.html": "complete updated HTML content",
+            "README.md": "complete updated README content",
+        })
+    else:
+        output_instructions = """RESPONSE FORMAT (valid JSON only):
+    {
+        "files": {
+            "index.html": "complete updated HTML content",
+            "README.md": "complete updated README content",
+        },
+        "description": "Concise description of changes made",
+    }
+
+    IMPORTANT: Return the raw JSON object only, with COMPLETE file contents. Do not use markdown code blocks or any wrapper text."""
     
     system_prompt = f"""
     You are an expert full-stack developer updating an existing code based on new briefs.
-    Do not add any comments, just provide final, complete, updated code. Make sure code is ready for production deployment, handle errors gracefully.
+    Do not add any comments, just provide {deliverable}. Make sure code is ready for production deployment, handle errors gracefully.
     """
 
  
@@ -602,7 +2118,7 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
     YOUR TASK:
         1. Analyze current code thoroughly. Check the README.md file to see what was done previously.
         2. Identify required updates based on briefs
-        3. Generate COMPLETE updated files with full content
+        3. {task_step}
         4. Verify all evaluation criteria will pass
         5. Handle any attachments as mentioned.
     
@@ -627,7 +2143,7 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
     - Maintain consistent code structure
 
     2. CODE QUALITY:
-    - Return COMPLETE file contents (not diffs or partial updates)
+    - {quality_rule}
     - NO placeholders or TODO comments
     - Production-ready, tested code
     - Ensure all evaluation criteria pass
@@ -639,17 +2155,7 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
 
 
 
-    RESPONSE FORMAT (valid JSON only):
-    {{
-        "files": {{
-            "index.html": "complete updated HTML content",
-            "README.md": "complete updated README content",
-            ".gitignore": "standard gitignore content",
-        }},
-        "description": "Concise description of changes made",
-    }}
-
-    IMPORTANT: Return the raw JSON object only, with COMPLETE file contents. Do not use markdown code blocks or any wrapper text."""
+    {output_instructions}"""
 
     content = build_multimodal_messages(prompt, task_data.get('attachments'))
 
@@ -662,15 +2168,25 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
             {"role": "system", "content": [{"type": "text", "text": system_prompt} ]},
             content
         ]
-        response_text = call_aipipe_llm(messages)
+        response_text = await call_aipipe_llm_async(messages, use_cache=not task_data.get('no_cache'))
 
-        code_structure = extract_json_from_response(response_text)
+        if edits:
+            code_structure = apply_edit_response(response_text, current_files, withheld)
+        else:
+            code_structure = extract_code_structure(response_text, output_format)
+            # the model only saw part (or nothing) of these, a returned copy would overwrite the real file
+            for filename in withheld & set(code_structure["files"]):
+                print(f"⚠️ Ignoring returned {filename}: it was not shown in full")
+                del code_structure["files"][filename]
+        print(f"   Response: {len(response_text)} characters for {len(code_structure['files'])} file(s)")
         
         print(f"✅ CODE UPDATED SUCCESSFULLY")
         
         return code_structure
         
     except Exception as e:
+        # don't serve the same broken response to the retry
+        llm_cache.discard(llm_payload(messages))
         raise Exception(f"Error updating code with LLM: {str(e)}")
 
 
@@ -679,44 +2195,210 @@ def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
 
 
 # -------------------------- PROCESS ATTACHMENTS -----------------------
+text_attachment_extensions = {"txt", "csv", "tsv", "json", "jsonl", "md"}
+
+
+def split_records(text: str, ext: str) -> tuple:
+    """
+    (header, records) of a text attachment, records never split a row / element:
+    csv / tsv rows (quoted newlines kept together, header separate), json array
+    elements (one compact line each), else lines.
+    """
+    if ext == "json":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, list):
+            return None, [json.dumps(item, ensure_ascii=False) + "\n" for item in data]
+
+    records = []
+    pending = ""
+    for line in text.splitlines(keepends=True):
+        if ext in ("csv", "tsv"):
+            # a field with an odd number of quotes continues on the next line
+            pending += line
+            if pending.count('"') % 2:
+                continue
+            line, pending = pending, ""
+            if not line.strip():
+                continue
+        records.append(line if line.endswith("\n") else line + "\n")
+    if pending:
+        records.append(pending if pending.endswith("\n") else pending + "\n")
+
+    if ext in ("csv", "tsv") and records:
+        return records[0], records[1:]
+    return None, records
+
+
+def allocate_tokens(needs: list, budget: int) -> list:
+    """Split budget over attachments: small ones get all they need, the rest share what is left equally"""
+    shares = [0] * len(needs)
+    remaining = budget
+    order = sorted(range(len(needs)), key=lambda i: needs[i])
+    for n, i in enumerate(order):
+        shares[i] = min(needs[i], remaining // (len(order) - n))
+        remaining -= shares[i]
+    return shares
+
+
+def head_tail_records(records: list, tokens: int) -> tuple:
+    """(head, tail) records within tokens, 80% of it for the head"""
+    head, used = [], 0
+    for record in records:
+        cost = estimate_tokens(record)
+        if used + cost > tokens * 0.8:
+            break
+        head.append(record)
+        used += cost
+    tail = []
+    for record in reversed(records[len(head):]):
+        cost = estimate_tokens(record)
+        if used + cost > tokens:
+            break
+        tail.insert(0, record)
+        used += cost
+    return head, tail
+
+
+def summarize_records(ext: str, header, records: list) -> str:
+    """Schema (columns / keys with inferred types and an example) + a few sample records"""
+    sample = records[:200]
+    columns = {}
+
+    def observe(name, value):
+        if value in ("", None):
+            kind = "empty"
+        elif isinstance(value, bool) or str(value).lower() in ("true", "false"):
+            kind = "bool"
+        else:
+            try:
+                float(value)
+                kind = "number"
+            except (TypeError, ValueError):
+                kind = type(value).__name__ if not isinstance(value, str) else "text"
+        entry = columns.setdefault(name, {"types": set(), "example": None})
+        entry["types"].add(kind)
+        if entry["example"] is None and kind != "empty":
+            entry["example"] = (value if isinstance(value, str) else json.dumps(value))[:40]
+
+    if ext in ("csv", "tsv") and header:
+        delimiter = "\t" if ext == "tsv" else ","
+        names = next(csv.reader([header], delimiter=delimiter))
+        for row in csv.reader(sample, delimiter=delimiter):
+            for name, value in zip(names, row):
+                observe(name, value)
+    else:
+        for record in sample:
+            try:
+                item = json.loads(record)
+            except json.JSONDecodeError:
+                break
+            if not isinstance(item, dict):
+                break
+            for name, value in item.items():
+                observe(name, value)
+
+    lines = [f"{len(records)} records"]
+    if columns:
+        lines.append("schema (from the first 200 records):")
+        for name, entry in columns.items():
+            lines.append(f"  - {name}: {'/'.join(sorted(entry['types']))}, e.g. {entry['example']!r}")
+    lines.append("sample records:")
+    lines.extend(("  " + record.rstrip("\n"))[:300] for record in records[:5])
+    if len(records) > 5:
+        lines.append("  ...")
+        lines.append(("  " + records[-1].rstrip("\n"))[:300])
+    return "\n".join(lines) + "\n"
+
+
+def chunk_records(header, records: list, max_tokens: int) -> list:
+    """Group records into chunks of up to max_tokens, the csv header repeated on every chunk"""
+    chunks = []
+    current = []
+    used = 0
+    for record in records:
+        cost = estimate_tokens(record)
+        if current and used + cost > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(record)
+        used += cost
+    if current or not chunks:
+        chunks.append(current)
+    return [(header or "") + "".join(chunk) for chunk in chunks]
+
+
+def build_text_attachment_parts(text_attachments: list, token_budget: int) -> list:
+    """
+    Content parts for the text attachments [(filename, ext, text)], within
+    token_budget overall. Each attachment degrades as far as its share of the
+    budget requires: full content -> head + tail records -> schema + sample summary.
+    Chunks follow record boundaries.
+    """
+    split = [split_records(text, ext) for _, ext, text in text_attachments]
+    needs = [
+        estimate_tokens(header or "") + sum(estimate_tokens(record) for record in records)
+        for header, records in split
+    ]
+    shares = allocate_tokens(needs, token_budget)
+
+    parts = []
+    for (filename, ext, text), (header, records), need, share in zip(text_attachments, split, needs, shares):
+        body_tokens = share - estimate_tokens(header or "")
+        if need <= share:
+            mode = "full"
+            chunks = chunk_records(header, records, attachment_chunk_tokens)
+            note = f"{len(records)} records" if records else "empty"
+        else:
+            head, tail = head_tail_records(records, body_tokens)
+            if len(head) >= attachment_min_records:
+                mode = "head+tail"
+                omitted = len(records) - len(head) - len(tail)
+                gap = [f"... {omitted} records omitted ...\n"] if omitted else []
+                chunks = chunk_records(header, head + gap + tail, attachment_chunk_tokens)
+                note = f"first {len(head)} and last {len(tail)} of {len(records)} records"
+            else:
+                mode = "summary"
+                summary = summarize_records(ext, header, records)[:max(share, 50) * 4]
+                chunks = [(f"columns: {header}" if header else "") + summary]
+                note = f"schema + sample of {len(records)} records"
 
+        print(f"📎 {filename}: {mode} (~{sum(estimate_tokens(chunk) for chunk in chunks)} of ~{need} tokens, {note})")
+        label = filename if mode == "full" else f"{filename} ({mode}: {note}, the file itself is complete)"
+        for i, chunk in enumerate(chunks, 1):
+            prefix = f"[FILE: {label}]" if len(chunks) == 1 else f"[CHUNK {i}/{len(chunks)} - {label}]"
+            parts.append({"type": "text", "text": f"{prefix}\n{chunk}"})
+    return parts
 
-def build_multimodal_messages(prompt_text: str, attachments: list, chunk_size: int = 5000):
+
+def build_multimodal_messages(prompt_text: str, attachments: list, token_budget: int = None):
     """
     Build a multimodal messages array for OpenRouter/OpenAI chat API.
 
     Parameters:
     - prompt_text: str → main instructions / task description
     - attachments: list of dicts {"name": ..., "url": base64 string}
-    - chunk_size: int → max characters per chunk for large text files
+    - token_budget: int → max tokens for all text attachments together (default ATTACHMENT_TOKENS)
 
     Returns:
     - messages: list of dicts ready for API
     """
 
     content = [{"type": "text", "text": prompt_text}]
+    text_attachments = []
 
-    for attachment in attachments:
+    for attachment in attachments or []:
         filename = attachment.get("name", "unknown")
         base64_data = attachment.get("url", "")
         ext = filename.split(".")[-1].lower()
 
         try:
-            # --- Text files ---
-            if ext in ["txt", "csv", "json"]:
+            # --- Text files (budgeted together below) ---
+            if ext in text_attachment_extensions:
                 decoded_bytes = base64.b64decode(base64_data.split(",", 1)[-1])
-                text_content = decoded_bytes.decode("utf-8", errors="ignore")
-
-                # Chunk large text to avoid token overflow
-                if len(text_content) > chunk_size:
-                    chunks = [text_content[i:i+chunk_size] for i in range(0, len(text_content), chunk_size)]
-                    for i, chunk in enumerate(chunks, 1):
-                        content.append({
-                            "type": "text",
-                            "text": f"[CHUNK {i}/{len(chunks)} - {filename}]\n{chunk}"
-                        })
-                else:
-                    content.append({"type": "text", "text": f"[FILE: {filename}]\n{text_content}"})
+                text_attachments.append((filename, ext, decoded_bytes.decode("utf-8", errors="ignore")))
 
             # --- Image files ---
             elif ext in ["png", "jpg", "jpeg", "gif", "webp"]:
@@ -739,12 +2421,107 @@ def build_multimodal_messages(prompt_text: str, attachments: list, chunk_size: i
                 "text": f"[ERROR PROCESSING FILE: {filename}] - {str(e)}"
             })
 
+    if text_attachments:
+        budget = attachment_token_budget if token_budget is None else token_budget
+        content.extend(build_text_attachment_parts(text_attachments, budget))
+
     # Return as a single user message
     return {"role": "user", "content": content}
 
 
 # -------------------------- CODE STRUCTURE ---------------------------
-def handle_query(data):
+async def run_stage_async(key: str, stage: str, func, *args):
+    """Run one pipeline stage, or return its checkpointed output if it already completed"""
+    checkpoint = checkpoints.get(key, stage)
+    if checkpoint is not None and checkpoint["state"] == "done":
+        print(f"⏭️ Resuming {key}: '{stage}' already done")
+        return json.loads(checkpoint["output"])
+
+    checkpoints.start(key, stage)
+    try:
+        output = await func(*args)
+    except Exception as e:
+        checkpoints.fail(key, stage, str(e))
+        raise
+    checkpoints.complete(key, stage, output)
+    return output
+
+
+
+async def provision_repo_async(repo_name: str):
+    """Create (or reset) the repo and enable / re-verify Pages, returns the pages url"""
+    if repo_pool.size > 0:
+        pages_url = await repo_pool.claim(repo_name)
+        if pages_url:
+            return pages_url
+
+    await create_github_repo_async(repo_name, True)
+    return await enable_github_pages_async(repo_name)
+
+
+
+async def handle_round_1_async(data):
+    """Handle round 1 - generate code and publish it to a fresh repo"""
+    repo_name = f"{data['task'].replace(' ', '-')}-{data['nonce']}"
+    key = job_key(data)
+
+    # repo + pages don't depend on the generated code, provision them while the LLM runs
+    provisioning = asyncio.create_task(run_stage_async(key, "provision", provision_repo_async, repo_name))
+
+    # when streaming, files that need a blob are uploaded as soon as they are complete
+    early_blobs = {}
+    early_uploads = []
+
+    async def upload_early(filename, content):
+        await provisioning
+        early_blobs[filename] = (content, await create_blob_async(repo_name, filename, content))
+
+    def on_file(filename, content):
+        if push_backend == "rest" and not is_inline_file(content):
+            early_uploads.append(asyncio.create_task(upload_early(filename, content)))
+
+    try:
+        code_structure = await run_stage_async(key, "generate", write_code_with_llm_async, data, on_file)
+    except Exception:
+        # let provisioning settle first, so cleanup doesn't race a half created repo
+        await asyncio.gather(provisioning, *early_uploads, return_exceptions=True)
+        raise
+
+    # join at push time
+    pages_url = await provisioning
+    await asyncio.gather(*early_uploads, return_exceptions=True)
+
+    files = []
+    for filename, content in code_structure["files"].items():
+        file = {
+            "name": filename,
+            "content": content
+        }
+        # reuse the early blob only if the final content is the same
+        if filename in early_blobs and early_blobs[filename][0] == content:
+            file["sha"] = early_blobs[filename][1]
+        files.append(file)
+
+    latest_sha = await run_stage_async(key, "push", push_files_to_repo_async, repo_name, files, 1)
+    artifacts.record(repo_name, code_structure["files"], latest_sha, pages_url)
+    obj = {
+        "email": data.get('email'),
+        "task": data.get('task'),
+        "round": data.get('round'),
+        "nonce": data.get('nonce'),
+        "repo_url": f"https://api.github.com/repos/{gh_user}/{repo_name}",
+        "commit_sha": latest_sha,
+        "pages_url": pages_url,
+    }
+
+    evaluation_url = data.get('evaluation_url')
+    if evaluation_url:
+        await run_stage_async(key, "evaluate", send_evaluation_async, evaluation_url, obj)
+    return obj
+
+
+
+async def handle_query_async(data):
 
     repo_name = f"{data['task'].replace(' ', '-')}-{data['nonce']}"
     max_tries = 3
@@ -752,40 +2529,18 @@ def handle_query(data):
         for i in range(max_tries):
             try:
                 if data.get('round') ==1:
-                    # test_api_connection()
-                    # get attachments
-                    code_structure = write_code_with_llm(data)
-                    files = []
-                    for filename, content in code_structure["files"].items():
-                        files.append({
-                            "name": filename,
-                            "content": content
-                        })
-                    create_github_repo(repo_name, True)
-                    pages_url = enable_github_pages(repo_name)
-                    latest_sha = push_files_to_repo(repo_name, files, 1)
-                    obj = {
-                        "email": data.get('email'),
-                        "task": data.get('task'),
-                        "round": data.get('round'),
-                        "nonce": data.get('nonce'),
-                        "repo_url": f"https://api.github.com/repos/{gh_user}/{repo_name}",
-                        "commit_sha": latest_sha,
-                        "pages_url": pages_url,
-                    }
-
-                    evaluation_url = data.get('evaluation_url')
-                    hit_evaluation_url(evaluation_url, obj)
+                    result = await handle_round_1_async(data)
                     print("Round 1 Successfull")
-                    break
+                    return result
 
                 else:
-                    handle_round_2(data)     
+                    result = await handle_round_2_async(data)     
                     print("Round 2 Successfull")    
-                    break
+                    return result
 
             except Exception as e:
                 print(f"Error occurred while handling query, Attempt {i+1}/{max_tries}: {e}")
+                print(f"   stage attempts: { {s['stage']: s['attempts'] for s in checkpoints.stages(job_key(data))} }")
                 if i == max_tries - 1:  # Last attempt failed
                     print("All retry attempts exhausted")
                     raise  # Re-raise the exception after final attempt
@@ -795,68 +2550,358 @@ def handle_query(data):
         print(f"❌ ERROR in round_1: {str(e)}")
         print(f"🧹 Cleaning up - attempting to delete repo: {repo_name}")
         
-        # Attempt cleanup if round 1
-        if data.get('round') ==1:
-            delete_github_repo(repo_name)
+        # Attempt cleanup if round 1, unless the app is published and only the callback failed
+        evaluate = checkpoints.get(job_key(data), "evaluate")
+        if evaluate is not None and evaluate["state"] == "failed":
+            print(f"   keeping {repo_name}: only the evaluation callback failed, a resubmission resends it")
+        elif data.get('round') ==1:
+            await delete_github_repo_async(repo_name)
+            # repo is gone, a resubmission must provision + push again (generated code stays reusable)
+            checkpoints.reset(job_key(data), "provision", "push")
         
         # Re-raise the exception so caller knows it failed
         raise Exception(f"round_1 failed: {str(e)}")        
 
 
+# only these characters matter when looking for object boundaries
+json_token_pattern = re.compile(r'[{}"]')
+# a whole JSON string literal, unrolled so it never backtracks
+json_string_pattern = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# how a JSON object (not a code block) starts
+json_object_start_pattern = re.compile(r'\{\s*["}]')
+
+
+def find_json_objects(text: str) -> list[tuple]:
+    """
+    (start, end) spans of every outermost {...} in text, in at most two
+    linear passes. Braces inside JSON strings are ignored (each string is
+    skipped in one regex match), quotes outside objects (prose) too. If the
+    text ends with an object still open (prose like "use the { key"), the
+    scan resumes once, from the next `{` that starts like a JSON object. An
+    unterminated string means the answer was cut off and ends the scan.
+    """
+    spans = []
+    depth = 0
+    start = 0
+    pos = 0
+    resumed = False
+
+    while True:
+        match = json_token_pattern.search(text, pos)
+        ch = text[match.start()] if match else None
+
+        if ch == '"' and depth:
+            string = json_string_pattern.match(text, match.start())
+            if string is None:
+                break  # unterminated string, response was cut off
+            pos = string.end()
+            continue
+
+        if ch is None:
+            if depth == 0 or resumed:
+                break
+            # unbalanced object: retry once, from the next JSON-looking `{`
+            resume = json_object_start_pattern.search(text, start + 1)
+            if resume is None:
+                break
+            resumed = True
+            depth = 0
+            pos = resume.start()
+            continue
+
+        i = match.start()
+        if ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+        pos = i + 1
+
+    return spans
+
+
+
 def extract_json_from_response(response_text: str) -> dict:
     """
     Robustly extract and parse JSON from LLM response.
     Handles multiple formats: pure JSON, markdown code blocks, mixed content.
+    Scans once for the outermost objects, then prefers the last one with a
+    `files` key, else the last one that parses.
     """
-    import re
-    
-    # Strategy 1: Try to find JSON in ```json code blocks
-    json_pattern = r'```json\s*(\{.*?\})\s*```'
-    matches = re.findall(json_pattern, response_text, re.DOTALL)
-    if matches:
-        # Take the last JSON block (most likely the final answer)
+    fallback = None
+    for start, end in reversed(find_json_objects(response_text)):
+        # a JSON object opens with a key or is empty, skip code like `{ if (a) ... }` without parsing it
+        if not json_object_start_pattern.match(response_text, start):
+            continue
         try:
-            return json.loads(matches[-1])
+            parsed = json.loads(response_text[start:end])
         except json.JSONDecodeError:
-            pass  # Fall through to next strategy
-    
-    # Strategy 2: Try to find JSON in any ``` code blocks
-    code_block_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-    matches = re.findall(code_block_pattern, response_text, re.DOTALL)
-    if matches:
-        for match in reversed(matches):  # Try from last to first
-            try:
-                return json.loads(match)
-            except json.JSONDecodeError:
-                continue
-    
-    # Strategy 3: Try to find a JSON object anywhere in the text
-    json_object_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-    matches = re.findall(json_object_pattern, response_text, re.DOTALL)
-    if matches:
-        for match in reversed(matches):  # Try from last to first
-            try:
-                parsed = json.loads(match)
-                # Validate it has expected structure
-                if isinstance(parsed, dict) and 'files' in parsed:
-                    return parsed
-            except json.JSONDecodeError:
-                continue
-    
-    # Strategy 4: Try parsing the entire response as JSON
-    try:
-        return json.loads(response_text.strip())
-    except json.JSONDecodeError:
-        pass
+            continue
+        if isinstance(parsed, dict) and 'files' in parsed:
+            return parsed
+        if fallback is None:
+            fallback = parsed
+
+    if fallback is not None:
+        return fallback
     
-    # If all strategies fail, raise a clear error
+    # Nothing parseable found, raise a clear error
     raise ValueError(
         "Could not extract valid JSON from LLM response. "
         "Response preview: " + response_text[:500]
     )    
 
 
-def hit_evaluation_url(evaluation_url, eval_obj):
+class FilesStreamParser:
+    """
+    Incremental scanner for a streamed `{"files": {name: content, ...}, ...}`
+    response. feed() returns every (name, content) whose string literal closed
+    in the new chunk, so files can be used before the whole response arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack = []  # open containers: {"type": "obj" | "arr", "key": ..., "parent_key": ..., "expect_key": ...}
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.emitted = []
+
+    def feed(self, text: str) -> list[tuple]:
+        self.buffer += text
+        completed = []
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.on_string(self.buffer[self.string_start:self.pos + 1], completed)
+
+            elif not self.stack:
+                # skip any wrapper text / code fence before the object
+                if ch == "{":
+                    self.stack.append({"type": "obj", "key": None, "parent_key": None, "expect_key": True})
+
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in "{[":
+                parent = self.stack[-1]
+                self.stack.append({
+                    "type": "obj" if ch == "{" else "arr",
+                    "key": None,
+                    "parent_key": parent["key"] if parent["type"] == "obj" else None,
+                    "expect_key": ch == "{",
+                })
+            elif ch in "}]":
+                self.stack.pop()
+            elif ch == ":":
+                self.stack[-1]["expect_key"] = False
+            elif ch == "," and self.stack[-1]["type"] == "obj":
+                self.stack[-1]["expect_key"] = True
+
+            self.pos += 1
+
+        return completed
+
+    def on_string(self, raw: str, completed: list):
+        top = self.stack[-1]
+        if top["type"] != "obj":
+            return
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if top["expect_key"]:
+            top["key"] = value
+        elif len(self.stack) == 2 and top["parent_key"] == "files":
+            self.emitted.append(top["key"])
+            completed.append((top["key"], value))
+
+
+# `=== FILE: name ===` opens a block, `=== END ===` closes the last one
+file_block_marker_pattern = re.compile(r'^[ \t]*=== (?:FILE: (.+?)|END) ===[ \t]*(?:\r?\n|\Z)', re.MULTILINE)
+# a whole block wrapped in a markdown fence despite the instructions
+file_block_fence_pattern = re.compile(r'[ \t]*```[\w.+-]*[ \t]*\r?\n(.*)\r?\n[ \t]*```[ \t]*', re.DOTALL)
+
+
+class FileBlockStreamParser:
+    """
+    Incremental parser for the "blocks" format. feed() returns every
+    (name, content) whose block was closed by the next header or `=== END ===`.
+    A block still open when the text stops (truncated response) never closes.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0          # start of the first line not yet scanned for a marker
+        self.current = None   # name of the open block
+        self.content_start = 0
+        self.ended = False
+        self.emitted = []
+
+    def feed(self, text: str) -> list[tuple]:
+        self.buffer += text
+        completed = []
+
+        while not self.ended:
+            match = file_block_marker_pattern.search(self.buffer, self.pos)
+            if match is None:
+                # markers are whole lines, rescan only the unfinished last one
+                self.pos = max(self.pos, self.buffer.rfind("\n") + 1)
+                break
+            if match.end() == len(self.buffer) and not match.group(0).endswith("\n") and match.group(1) is not None:
+                break  # header line may still be growing, wait for its newline
+
+            if self.current is not None:
+                content = self.buffer[self.content_start:match.start()]
+                if content.endswith("\n"):
+                    content = content[:-1]
+                fenced = file_block_fence_pattern.fullmatch(content)
+                if fenced:
+                    content = fenced.group(1)
+                self.emitted.append(self.current)
+                completed.append((self.current, content))
+
+            self.current = match.group(1)
+            self.ended = self.current is None
+            self.content_start = self.pos = match.end()
+
+        return completed
+
+
+def parse_file_blocks(response_text: str) -> dict:
+    """
+    Files of a "blocks" response as {"files": {...}, "description": ""}.
+    Blocks closed before a truncation are kept, an unterminated last block is dropped.
+    """
+    parser = FileBlockStreamParser()
+    files = dict(parser.feed(response_text))
+    if parser.current is not None:
+        print(f"⚠️ Response ended inside '{parser.current}' (no closing marker), dropping it")
+    if not files:
+        raise ValueError(
+            "Could not extract file blocks from LLM response. "
+            "Response preview: " + response_text[:500]
+        )
+    return {"files": files, "description": ""}
+
+
+# `=== EDIT: name ===` / `=== FILE: name ===` / `=== END ===` in an edits response
+edit_block_marker_pattern = re.compile(r'^[ \t]*=== (?:(EDIT|FILE): (.+?)|END) ===[ \t]*$', re.MULTILINE)
+search_replace_pattern = re.compile(
+    r'^<<<<<<< SEARCH[ \t]*\r?\n(.*?)^=======[ \t]*\r?\n(.*?)^>>>>>>> REPLACE[ \t]*$', re.MULTILINE | re.DOTALL
+)
+
+
+def find_fuzzy_span(lines: list, search: str):
+    """
+    (start, end) line span of `search` in lines when it doesn't match exactly:
+    first ignoring whitespace per line, then the most similar window of the
+    same size if it is at least edit_fuzzy_threshold alike. None if no match.
+    """
+    search_lines = search.strip("\n").splitlines()
+    if not search_lines:
+        return None
+    size = len(search_lines)
+
+    stripped = [line.strip() for line in lines]
+    wanted = [line.strip() for line in search_lines]
+    for start in range(len(lines) - size + 1):
+        if stripped[start:start + size] == wanted:
+            return start, start + size
+
+    best, best_ratio = None, edit_fuzzy_threshold
+    matcher = difflib.SequenceMatcher(autojunk=False)
+    matcher.set_seq2("\n".join(wanted))
+    for start in range(len(lines) - size + 1):
+        matcher.set_seq1("\n".join(stripped[start:start + size]))
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = (start, start + size), ratio
+    return best
+
+
+def apply_edits(content: str, hunks: list, filename: str) -> str:
+    """Apply (search, replace) hunks in order, exact match first, fuzzy fallback; raises ValueError"""
+    for i, (search, replace) in enumerate(hunks, 1):
+        if not search.strip():
+            content = content + ("" if not content or content.endswith("\n") else "\n") + replace
+            continue
+        # exact match, but only starting at a line boundary (else indentation gets mangled)
+        at = content.find(search)
+        while at > 0 and content[at - 1] != "\n":
+            at = content.find(search, at + 1)
+        if at != -1:
+            content = content[:at] + replace + content[at + len(search):]
+            continue
+
+        lines = content.splitlines(keepends=True)
+        span = find_fuzzy_span(lines, search)
+        if span is None:
+            raise ValueError(f"Edit {i} for {filename} does not match the current file: {search[:200]!r}")
+        print(f"   ~ edit {i} for {filename} applied fuzzily at lines {span[0] + 1}-{span[1]}")
+        if replace and not replace.endswith("\n") and span[1] < len(lines):
+            replace += "\n"
+        content = "".join(lines[:span[0]]) + replace + "".join(lines[span[1]:])
+    return content
+
+
+def apply_edit_response(response_text: str, current_files: dict, withheld: set = frozenset()) -> dict:
+    """
+    Turn an "edits" response into {"files": {...}, "description": ""} holding
+    the full new content of every edited / written file. Raises ValueError on
+    anything that doesn't parse or apply, so the caller can fall back to full files.
+    Whole-file blocks for `withheld` paths (not shown in full) are ignored,
+    edits to them apply to the real file and are kept.
+    """
+    markers = list(edit_block_marker_pattern.finditer(response_text))
+    if not any(match.group(1) is None for match in markers):
+        raise ValueError("Edit response has no closing `=== END ===` marker")
+
+    files = {}
+    for match, following in zip(markers, markers[1:]):
+        kind, filename = match.group(1), match.group(2)
+        if kind is None:
+            break
+        body = response_text[match.end():following.start()].strip("\r\n") + "\n"
+
+        if kind == "FILE":
+            if filename in withheld:
+                print(f"⚠️ Ignoring returned {filename}: it was not shown in full")
+                continue
+            files[filename] = body
+            continue
+        hunks = search_replace_pattern.findall(body)
+        if not hunks or len(hunks) != body.count("<<<<<<< SEARCH"):
+            raise ValueError(f"Malformed edit block for {filename}")
+        files[filename] = apply_edits(files.get(filename, current_files.get(filename, "")), hunks, filename)
+        print(f"   ✏️ {filename}: {len(hunks)} edit(s)")
+
+    if not files:
+        raise ValueError("Edit response changes no files")
+    return {"files": files, "description": ""}
+
+
+def extract_code_structure(response_text: str, output_format: str = "json") -> dict:
+    if output_format == "blocks":
+        return parse_file_blocks(response_text)
+    return extract_json_from_response(response_text)
+
+
+async def hit_evaluation_url_async(evaluation_url, eval_obj):
     # Extract evaluation URL
     if not evaluation_url:
         return {"Error": "Missing evaluation_url"}
@@ -867,7 +2912,7 @@ def hit_evaluation_url(evaluation_url, eval_obj):
 
     for attempt in range(1, max_retries + 1):
         try:
-            response = requests.post(evaluation_url, json=eval_obj, timeout=10)
+            response = await http.post(evaluation_url, json=eval_obj, timeout=10)
 
             if response.status_code == 200:
                 return {
@@ -879,31 +2924,40 @@ def hit_evaluation_url(evaluation_url, eval_obj):
 
             # non-200 → log and retry
             print(f"[Attempt {attempt}] Non-200: {response.status_code}, retrying in {delay}s")
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"[Attempt {attempt}] Request failed: {e}, retrying in {delay}s")
 
         # wait before retrying
-        time.sleep(delay)
+        await asyncio.sleep(delay)
         delay *= 2  # exponential backoff (1, 2, 4, 8, ...)
 
     return {"Error": f"Failed after {max_retries} retries"}    
 
 
-def handle_round_2(data):
+async def send_evaluation_async(evaluation_url, eval_obj):
+    """The "evaluate" stage: like hit_evaluation_url_async, but raises when nothing was delivered"""
+    result = await hit_evaluation_url_async(evaluation_url, eval_obj)
+    if "Error" in result:
+        raise Exception(f"Evaluation callback not delivered: {result['Error']}")
+    return result
+
+
+async def handle_round_2_async(data):
     """Handle round 2 - update existing repo based on feedback"""
     repo_name = f"{data['task'].replace(' ', '-')}-{data['nonce']}"
+    key = job_key(data)
     
     try:
         print(f"🔄 Starting Round 2 for {repo_name}")
         
         # Step 1: Get current files from repo
         print("📥 Fetching current files from repo...")
-        current_files = get_current_repo_files(repo_name)
+        current_files = await run_stage_async(key, "fetch", get_repo_files_async, repo_name)
         print(f"✅ Found {len(current_files)} files")
         
         # Step 2: Generate updated code with LLM
         print("🤖 Generating updated code with LLM...")
-        code_structure = write_code_update_with_llm(data, current_files)
+        code_structure = await run_stage_async(key, "generate", write_code_update_with_llm_async, data, current_files)
         
         # Step 3: Prepare files for push
         files = []
@@ -913,13 +2967,14 @@ def handle_round_2(data):
                 "content": content
             })
         
-        # Step 4: Push updated files
+        # Step 4: Push updated files (only those that changed)
         print(f"📤 Pushing {len(files)} updated files...")
-        latest_sha = push_files_to_repo(repo_name, files, round=2)
+        latest_sha = await run_stage_async(key, "push", push_changed_files_async, repo_name, files, current_files, 2)
         
         # Step 5: Get pages URL
 
         pages_url = f"https://{gh_user}.github.io/{repo_name}/"
+        artifacts.record(repo_name, {**current_files, **code_structure["files"]}, latest_sha, pages_url)
         
         # Step 6: Prepare response
         obj = {
@@ -935,7 +2990,7 @@ def handle_round_2(data):
         # Step 7: Hit evaluation URL
         evaluation_url = data.get('evaluation_url')
         if evaluation_url:
-            hit_evaluation_url(evaluation_url, obj)
+            await run_stage_async(key, "evaluate", send_evaluation_async, evaluation_url, obj)
         
         print(f"✅ Round 2 completed successfully!")
         return obj
@@ -946,4 +3001,62 @@ def handle_round_2(data):
 
 
 
+# -------------------------- SYNC WRAPPERS ---------------------------
+# Thin wrappers around the async pipeline, kept for existing sync callers.
+
+def check_repo_exists(repo_name: str) -> bool:
+    return run_sync(check_repo_exists_async(repo_name))
+
+
+def create_github_repo(repo_name: str, force_recreate: bool):
+    return run_sync(create_github_repo_async(repo_name, force_recreate))
+
+
+def enable_github_pages(repo_name: str):
+    return run_sync(enable_github_pages_async(repo_name))
+
+
+def push_files_to_repo(repo_name, files: list[dict], round:int):
+    return run_sync(push_files_to_repo_async(repo_name, files, round))
+
+
+def delete_github_repo(repo_name: str):
+    return run_sync(delete_github_repo_async(repo_name))
+
+
+def get_current_repo_files(repo_name: str, branch: str = "main") -> dict:
+    return run_sync(get_current_repo_files_async(repo_name, branch))
+
+
+def get_sha_of_latest_commit(repo_name: str, branch: str = "main") -> str:
+    return run_sync(get_sha_of_latest_commit_async(repo_name, branch))
+
+
+def call_aipipe_llm(messages: list=[], model: str = "gpt-4o-mini", use_cache: bool = True) -> str:
+    return run_sync(call_aipipe_llm_async(messages, model, use_cache))
+
+
+def write_code_with_llm(task_data: dict, on_file=None) -> dict:
+    return run_sync(write_code_with_llm_async(task_data, on_file))
+
+
+def write_code_update_with_llm(task_data: dict, current_files: dict) -> dict:
+    return run_sync(write_code_update_with_llm_async(task_data, current_files))
+
+
+def hit_evaluation_url(evaluation_url, eval_obj):
+    return run_sync(hit_evaluation_url_async(evaluation_url, eval_obj))
+
+
+def handle_round_1(data):
+    return run_sync(handle_round_1_async(data))
+
+
+def handle_round_2(data):
+    return run_sync(handle_round_2_async(data))
+
+
+def handle_query(data):
+    return run_sync(handle_query_async(data))
 
+# -------------------------- SYNC WRAPPERS --------------------------- #
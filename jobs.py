@@ -0,0 +1,311 @@
+import os
+import time
+import json
+import sqlite3
+import asyncio
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# durable job queue for /handle_task
+jobs_db_path = os.getenv('JOBS_DB_PATH', 'jobs.db')
+job_workers = int(os.getenv('JOB_WORKERS', '4'))
+job_poll_interval = float(os.getenv('JOB_POLL_INTERVAL', '5'))
+# finished jobs are kept (for duplicate submissions) up to this age / count
+job_result_ttl = float(os.getenv('JOB_RESULT_TTL', str(7 * 24 * 3600)))
+job_result_max = int(os.getenv('JOB_RESULT_MAX', '1000'))
+
+
+def connect_db(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: commits don't fsync, writes stay sub-millisecond
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# -------------------------- JOB QUEUE ---------------------------
+class JobQueue:
+    """
+    Persistent local job queue (SQLite in WAL mode) + a pool of async workers.
+    Jobs survive restarts: anything still `running` at boot is queued again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = connect_db(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT,
+                nonce TEXT,
+                round INTEGER,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        if "result" not in [row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")]:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN result TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (task, nonce, round)")
+        self.wakeup = None
+
+    def enqueue(self, data: dict) -> dict:
+        """
+        Persist a task, idempotent on (task, nonce, round): a duplicate submission
+        collapses onto the queued / running / done job and gets its status back.
+        Only a failed job is queued again (its checkpoints make the rerun cheap).
+        """
+        # the secret is only needed at intake, never store it
+        payload = {key: value for key, value in data.items() if key != "secret"}
+        key = (data.get("task"), data.get("nonce"), data.get("round"))
+        now = time.time()
+        with self.lock:
+            existing = self.conn.execute(
+                "SELECT id, state, result FROM jobs WHERE task = ? AND nonce = ? AND round = ? ORDER BY id DESC LIMIT 1",
+                key
+            ).fetchone()
+            if existing and existing["state"] != "failed":
+                return {
+                    "id": existing["id"],
+                    "state": existing["state"],
+                    "duplicate": True,
+                    "result": json.loads(existing["result"]) if existing["result"] else None,
+                }
+
+            if existing:
+                self.conn.execute(
+                    "UPDATE jobs SET state = 'queued', payload = ?, error = NULL, updated_at = ? WHERE id = ?",
+                    (json.dumps(payload), now, existing["id"])
+                )
+                job_id = existing["id"]
+            else:
+                job_id = self.conn.execute(
+                    "INSERT INTO jobs (task, nonce, round, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, json.dumps(payload), now, now)
+                ).lastrowid
+
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return {"id": job_id, "state": "queued", "duplicate": False, "result": None}
+
+    def claim(self):
+        """Mark the oldest queued job as running, returns (id, payload) or None"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT id, payload FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (time.time(), row["id"])
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return (row["id"], json.loads(row["payload"])) if row else None
+
+    def finish(self, job_id: int, result: dict = None, error: str = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                ("failed" if error else "done", json.dumps(result), error, time.time(), job_id)
+            )
+        self.prune()
+
+    def prune(self):
+        """Evict finished jobs (and their checkpoints) past the TTL or beyond the max count"""
+        with self.lock:
+            evicted = self.conn.execute("""
+                SELECT id, task, nonce, round FROM jobs
+                WHERE state IN ('done', 'failed') AND (
+                    updated_at < ?
+                    OR id NOT IN (SELECT id FROM jobs WHERE state IN ('done', 'failed') ORDER BY updated_at DESC LIMIT ?)
+                )
+            """, (time.time() - job_result_ttl, job_result_max)).fetchall()
+            if evicted:
+                self.conn.executemany("DELETE FROM stages WHERE job_key = ?", [(job_key(dict(row)),) for row in evicted])
+                self.conn.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in evicted])
+
+    def get(self, task: str, nonce: str, round: int):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM jobs WHERE task = ? AND nonce = ? AND round = ? ORDER BY id DESC LIMIT 1",
+                (task, nonce, round)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list(self, state: str = None, limit: int = 100) -> list[dict]:
+        """Newest jobs first, optionally only those in `state`"""
+        query = "SELECT id, task, nonce, round, state, attempts, error, created_at, updated_at FROM jobs"
+        params = []
+        if state:
+            query += " WHERE state = ?"
+            params.append(state)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def recover(self) -> int:
+        """Requeue jobs interrupted by a restart / crash"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = 'queued', updated_at = ? WHERE state = 'running'", (time.time(),)
+            )
+        return cursor.rowcount
+
+    async def worker(self, handler):
+        while True:
+            job = self.claim()
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, data = job
+            try:
+                result = await handler(data)
+                self.finish(job_id, result=result)
+            except Exception as e:
+                print(f"❌ Job {job_id} failed: {e}")
+                self.finish(job_id, error=str(e))
+
+    async def run(self, handler, workers: int):
+        """Resume interrupted jobs, then process the queue with `workers` concurrent workers"""
+        self.wakeup = asyncio.Event()
+        resumed = self.recover()
+        if resumed:
+            print(f"♻️ Resuming {resumed} interrupted job(s)")
+        await asyncio.gather(*(self.worker(handler) for _ in range(workers)))
+
+
+job_queue = JobQueue(jobs_db_path)
+
+# -------------------------- JOB QUEUE --------------------------- #
+
+
+# -------------------------- CHECKPOINTS ---------------------------
+def job_key(data: dict) -> str:
+    return f"{data.get('task')}-{data.get('nonce')}-{data.get('round')}"
+
+
+class CheckpointStore:
+    """
+    Per-stage outputs of a job ({task}-{nonce}-{round}), so a retry resumes
+    at the stage that failed instead of regenerating everything.
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = connect_db(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS stages (
+                job_key TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output TEXT,
+                error TEXT,
+                started_at REAL,
+                ended_at REAL,
+                PRIMARY KEY (job_key, stage)
+            )
+        """)
+
+    def get(self, key: str, stage: str):
+        """Row of a stage, or None if it never ran"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT * FROM stages WHERE job_key = ? AND stage = ?", (key, stage)
+            ).fetchone()
+
+    def start(self, key: str, stage: str):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO stages (job_key, stage, state, attempts, started_at) VALUES (?, ?, 'running', 1, ?)
+                ON CONFLICT (job_key, stage) DO UPDATE SET
+                    state = 'running', attempts = attempts + 1, error = NULL, started_at = excluded.started_at, ended_at = NULL
+            """, (key, stage, time.time()))
+
+    def complete(self, key: str, stage: str, output):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE stages SET state = 'done', output = ?, ended_at = ? WHERE job_key = ? AND stage = ?",
+                (json.dumps(output), time.time(), key, stage)
+            )
+
+    def fail(self, key: str, stage: str, error: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE stages SET state = 'failed', error = ?, ended_at = ? WHERE job_key = ? AND stage = ?",
+                (error, time.time(), key, stage)
+            )
+
+    def reset(self, key: str, *stages: str):
+        """Forget completed stages whose side effects were undone (e.g. repo deleted)"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE stages SET state = 'reset', output = NULL WHERE job_key = ? AND stage = ?",
+                [(key, stage) for stage in stages]
+            )
+
+    def stages(self, key: str) -> list[dict]:
+        """Per-stage state / attempts / timings of a job, in start order"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT stage, state, attempts, error, started_at, ended_at FROM stages WHERE job_key = ? ORDER BY started_at",
+                (key,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+checkpoints = CheckpointStore(jobs_db_path)
+
+# -------------------------- CHECKPOINTS --------------------------- #
+
+
+# -------------------------- STATUS ---------------------------
+def task_status(task: str, nonce: str, round: int):
+    """Job state + per-stage timings / attempts, or None if the task is unknown"""
+    job = job_queue.get(task, nonce, round)
+    if job is None:
+        return None
+
+    stages = checkpoints.stages(job_key(job))
+    for stage in stages:
+        stage["duration"] = stage["ended_at"] - stage["started_at"] if stage["ended_at"] else None
+    running = [stage["stage"] for stage in stages if stage["state"] == "running"]
+    result = json.loads(job["result"] or "null") or {}
+
+    return {
+        "task": job["task"],
+        "nonce": job["nonce"],
+        "round": job["round"],
+        "state": job["state"],
+        "current_stage": ", ".join(running) or (stages[-1]["stage"] if stages else None),
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "stages": stages,
+        "commit_sha": result.get("commit_sha"),
+        "pages_url": result.get("pages_url"),
+    }
+
+# -------------------------- STATUS --------------------------- #
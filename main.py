@@ -1,10 +1,26 @@
+import json
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from helper import verify_secret, handle_query
-from fastapi import BackgroundTasks
+from helper import verify_secret, handle_query_async, repo_pool, llm_cache, llm_latency, artifacts, http
+from jobs import job_queue, job_workers, task_status
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # resume interrupted jobs and start the worker pool
+    queue_task = asyncio.create_task(job_queue.run(handle_query_async, job_workers))
+    # keep the warm repo pool topped up in the background
+    pool_task = asyncio.create_task(repo_pool.run()) if repo_pool.size > 0 else None
+    yield
+    queue_task.cancel()
+    if pool_task:
+        pool_task.cancel()
+    await http.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 # --- Enable CORS for all origins ---
@@ -22,6 +38,42 @@ app.add_middleware(
 def health_check():
     return {"Status": "Running"}
 
+# job status + stage timings
+@app.get("/tasks")
+def list_tasks(state: str = None, limit: int = 100):
+    return job_queue.list(state, limit)
+
+@app.get("/tasks/{task}/{nonce}/{round}")
+def get_task(task: str, nonce: str, round: int):
+    task_info = task_status(task, nonce, round)
+    if task_info is None:
+        return Response(
+            content='{"Error": "Task not found"}',
+            media_type="application/json",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return task_info
+
+# warm repo pool hit / miss metrics
+@app.get("/metrics/repo_pool")
+def repo_pool_metrics():
+    return repo_pool.stats()
+
+# llm response cache hit / miss metrics
+@app.get("/metrics/llm_cache")
+def llm_cache_metrics():
+    return llm_cache.stats()
+
+# llm latency percentiles + hedge counts per model
+@app.get("/metrics/llm_latency")
+def llm_latency_metrics():
+    return llm_latency.stats()
+
+# local artifact store hit / miss metrics (round 2 fetches served locally)
+@app.get("/metrics/artifacts")
+def artifacts_metrics():
+    return artifacts.stats()
+
 # post endpoint for repo creation
 # @app.post("/handle_task_1")
 # def handle_task(data: dict):
@@ -56,7 +108,7 @@ def health_check():
 
 
 @app.post("/handle_task")
-async def handle_task(data: dict, background_tasks: BackgroundTasks):
+async def handle_task(data: dict):
     
     # Validate secret
     if not verify_secret(data.get("secret", "")):
@@ -66,8 +118,16 @@ async def handle_task(data: dict, background_tasks: BackgroundTasks):
             status_code=status.HTTP_401_UNAUTHORIZED
         )
     
-    # Add the long-running task to background
-    background_tasks.add_task(handle_query, data)
+    # Persist the task, the worker pool picks it up (survives restarts)
+    job = job_queue.enqueue(data)
+
+    # Duplicate (task, nonce, round): no new job, report the existing one
+    if job["duplicate"]:
+        return Response(
+            content=json.dumps({"Data": "Received", "Duplicate": True, "Status": job["state"], "Result": job["result"]}),
+            media_type="application/json",
+            status_code=status.HTTP_200_OK
+        )
     
     # Return immediately
     return Response(